@@ -0,0 +1,169 @@
+"""
+context_delta.py - Diff semántico de PatientContext para el observer.
+
+Decide si un cambio de contexto es MATERIAL (re-analizar con el LLM)
+o TRIVIAL (reutilizar el último resultado estructurado):
+
+- Solo cuentan los campos que llegan al prompt (_format_context)
+- Mayúsculas, tildes, puntuación y espacios no cuentan
+- Correcciones de tipeo no cuentan: solo un token largo reemplazado por
+  otro a 1 edición (sustitución, inserción, borrado o transposición) y sin
+  cambio de prefijo clínico (hipo/hiper, taqui/bradi, a/an, in/des...).
+  "hipotensión" → "hipertensión" SÍ es material
+- Palabras de relleno (stopwords) no cuentan, salvo negaciones
+- Números, negaciones y palabras clínicas nuevas/eliminadas sí cuentan
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Campos estructurados que entran al prompt: cualquier cambio es material
+STRUCTURED_FIELDS = ("age", "sex", "medical_history", "reason_for_visit")
+
+# Texto libre: se compara a nivel de tokens
+TEXT_FIELDS = ("clinical_text",)
+
+# Corrección de tipeo: a lo más TYPO_MAX_EDITS ediciones entre tokens de
+# al menos TYPO_MIN_LENGTH letras
+TYPO_MAX_EDITS = 1
+TYPO_MIN_LENGTH = 5
+
+# Prefijos que invierten o cambian el sentido clínico: si el reemplazo toca
+# uno, nunca es tipeo (el más largo primero: "hiper" antes que "hipo")
+CLINICAL_PREFIXES = (
+    "hiper", "hipo", "taqui", "bradi", "poli", "oligo", "anti", "pre", "post",
+    "pos", "intra", "extra", "supra", "sub", "infra", "micro", "macro", "hemi",
+    "dis", "des", "in", "im", "an", "a",
+)
+
+NEGATIONS = {"no", "sin", "niega", "nunca", "ausencia", "ausente", "negativo", "negativa"}
+
+STOPWORDS = {
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al",
+    "a", "en", "y", "o", "u", "e", "que", "con", "por", "para", "se", "su",
+    "sus", "lo", "le", "les", "es", "son", "hace", "desde", "hay", "muy",
+    "mas", "pero", "como", "ya", "tambien", "este", "esta", "paciente",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@dataclass
+class ContextDelta:
+    """Resultado del diff entre el contexto analizado y el nuevo."""
+    material: bool
+    structural: bool = False
+    reasons: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {"material": self.material, "structural": self.structural, "reasons": self.reasons}
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _tokens(text) -> List[str]:
+    if text is None:
+        return []
+    return _TOKEN_RE.findall(_strip_accents(str(text).lower()))
+
+
+def _normalize_value(value) -> str:
+    return " ".join(_tokens(value))
+
+
+def _is_significant(token: str) -> bool:
+    return token in NEGATIONS or token.isdigit() or (
+        token not in STOPWORDS and len(token) >= 3
+    )
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Distancia de Damerau-Levenshtein (OSA), cortada en limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _clinical_prefix(token: str) -> str:
+    for prefix in CLINICAL_PREFIXES:
+        if token.startswith(prefix):
+            return prefix
+    return ""
+
+
+def _is_typo_fix(added: str, removed: str) -> bool:
+    """fibre → fiebre sí; hipotension → hipertension o "dolor" → "color" no."""
+    if min(len(added), len(removed)) < TYPO_MIN_LENGTH:
+        return False
+    if any(c.isdigit() for c in added + removed):
+        return False
+    if _clinical_prefix(added) != _clinical_prefix(removed):
+        return False
+    # La primera letra casi nunca es el tipeo y cambia la palabra (dolor/color)
+    if added[0] != removed[0]:
+        return False
+    return _edit_distance(added, removed, TYPO_MAX_EDITS) <= TYPO_MAX_EDITS
+
+
+def _text_delta(old: str, new: str) -> List[str]:
+    """Tokens significativos agregados/eliminados (descontando correcciones de tipeo)."""
+    old_counts = Counter(t for t in _tokens(old) if _is_significant(t))
+    new_counts = Counter(t for t in _tokens(new) if _is_significant(t))
+
+    added = list((new_counts - old_counts).elements())
+    removed = list((old_counts - new_counts).elements())
+
+    # Emparejar reemplazos parecidos (fibre → fiebre): son correcciones, no contenido nuevo
+    unmatched_added = []
+    for token in added:
+        match = None
+        if not token.isdigit() and token not in NEGATIONS:
+            for candidate in removed:
+                if _is_typo_fix(token, candidate):
+                    match = candidate
+                    break
+        if match is None:
+            unmatched_added.append(token)
+        else:
+            removed.remove(match)
+
+    return [f"+{t}" for t in unmatched_added] + [f"-{t}" for t in removed]
+
+
+def diff_contexts(previous: Optional[dict], current: dict) -> ContextDelta:
+    """Compara el contexto ya analizado con el nuevo."""
+    if previous is None:
+        return ContextDelta(material=True, structural=True, reasons=["sin análisis previo"])
+
+    reasons: List[str] = []
+    structural = False
+
+    for name in STRUCTURED_FIELDS:
+        if _normalize_value(previous.get(name)) != _normalize_value(current.get(name)):
+            structural = True
+            reasons.append(f"{name} cambió")
+
+    for name in TEXT_FIELDS:
+        changed = _text_delta(previous.get(name) or "", current.get(name) or "")
+        if changed:
+            reasons.append(f"{name}: {' '.join(changed[:10])}")
+
+    return ContextDelta(material=bool(reasons), structural=structural, reasons=reasons)
@@ -8,14 +8,23 @@ MODO EXPERIMENTAL: LLM Libre
 - Objetivo: mapear capacidades reales del LLM
 """
 
+import asyncio
+import copy
+import hashlib
 import json
 import os
 import time
 import re
 import httpx
+from collections import deque
 from datetime import datetime
 from typing import Dict, Any, Optional, List, Tuple
 
+from backend.app.services.ollama_client import get_ollama_client
+from backend.app.services.lru_cache import LRUCache
+from backend.app.services.single_flight import SingleFlight
+from backend.agents.context_delta import diff_contexts
+
 # =========================
 # CONFIGURACIÓN OLLAMA
 # =========================
@@ -23,6 +32,22 @@ OLLAMA_BASE_URL = os.getenv("OLLAMA_URL", "http://192.168.1.8:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:3b")
 OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "60.0"))  # 60s LAB, objetivo <4s
 
+# KV-cache: /api/chat con system prompt fijo + keep_alive → el prefijo
+# PROMPT_OBSERVER se evalúa una vez por carga de modelo, no por request
+OBSERVER_USE_CHAT = os.getenv("OBSERVER_USE_CHAT", "1") not in ("0", "false", "False")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Cache de resultados (compartido entre requests): prompt normalizado + modelo
+OBSERVER_CACHE_SIZE = int(os.getenv("OBSERVER_CACHE_SIZE", "256"))
+OBSERVER_CACHE_TTL_S = float(os.getenv("OBSERVER_CACHE_TTL_S", "900"))
+
+# Estado de throttling por sesión (acotado)
+OBSERVER_MAX_SESSIONS = int(os.getenv("OBSERVER_MAX_SESSIONS", "1000"))
+OBSERVER_SESSION_TTL_S = float(os.getenv("OBSERVER_SESSION_TTL_S", "3600"))
+
+# Entradas crudas recientes que guarda el CognitiveLogger (0 = solo agregados)
+COGNITIVE_LOG_RECENT = int(os.getenv("COGNITIVE_LOG_RECENT", "100"))
+
 
 def safe_str(value) -> str:
     """Convierte cualquier valor a string seguro (nunca None)."""
@@ -121,13 +146,178 @@ COGNITIVE_PATTERNS = {
 }
 
 
+# =========================
+# SCANNER PRECOMPILADO (import-time)
+# =========================
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+# Categoría de COGNITIVE_PATTERNS → clave en findings
+_FINDING_KEYS = {
+    "uncertainty": "uncertainty_markers",
+    "contradiction": "contradiction_markers",
+    "overgeneralization": "overgeneralization_markers",
+    "fabrication_markers": "fabrication_markers",
+}
+
+
+def _is_literal(pattern: str) -> bool:
+    return not any(c in _REGEX_META for c in pattern)
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """"a|b" sí; "(a|b)c" y "[|]" no."""
+    depth = 0
+    escaped = in_class = False
+    for c in pattern:
+        if escaped:
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+    return False
+
+
+def _literal_prefix(pattern: str) -> str:
+    """
+    Prefijo literal que todo match de la regex debe contener
+    ("sin embargo.*pero" → "sin embargo"). "" si no hay uno seguro:
+    - Alternancia de primer nivel ("a|b"): ningún prefijo es obligatorio
+    - Cuantificador que admite cero (?, *, {m,n}): el átomo anterior no
+      es obligatorio, el prefijo termina antes de él ("colou?r" → "colo")
+    """
+    if _has_top_level_alternation(pattern):
+        return ""
+    for i, c in enumerate(pattern):
+        if c in _REGEX_META:
+            if c in "?*{":
+                return pattern[:max(i - 1, 0)]
+            return pattern[:i]
+    return pattern
+
+
+class CognitiveScanner:
+    """
+    Escanea todas las categorías de COGNITIVE_PATTERNS con un plan armado
+    al importar (nada se compila ni se busca en el cache de `re` por respuesta).
+
+    - Frases literales: re.findall de un literal es el literal repetido
+      tantas veces como aparece, así que basta str.count (búsqueda en C,
+      mucho más rápida que el motor de regex)
+    - Patrones con regex real (p.ej. "sin embargo.*pero"): precompilados, y
+      solo se ejecutan si su prefijo literal aparece en el texto
+
+    Mismo resultado y orden que el loop re.findall por patrón.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self._plan: List[Tuple[str, List[tuple]]] = []
+        for category, plist in patterns.items():
+            steps = []
+            for pattern in plist:
+                if _is_literal(pattern):
+                    steps.append((pattern, None, None))
+                else:
+                    steps.append((None, re.compile(pattern), _literal_prefix(pattern)))
+            self._plan.append((category, steps))
+
+    def scan(self, text_lower: str) -> Dict[str, List[str]]:
+        """Retorna {categoría: [matches]} para todas las categorías."""
+        findings: Dict[str, List[str]] = {}
+        for category, steps in self._plan:
+            matches: List[str] = []
+            for literal, regex, prefix in steps:
+                if literal is not None:
+                    count = text_lower.count(literal)
+                    if count:
+                        matches.extend([literal] * count)
+                elif not prefix or prefix in text_lower:
+                    matches.extend(regex.findall(text_lower))
+            findings[category] = matches
+        return findings
+
+
+class ForbiddenScanner:
+    """
+    Primer patrón prohibido en orden de lista que matchea el texto.
+
+    Si todos están anclados con ^, todos los matches empiezan en la posición
+    0: una sola regex con el ancla fuera de la alternancia se evalúa en una
+    posición y su primera rama que matchea es la primera de la lista.
+    Sin ancla común, una alternancia devolvería el match más a la izquierda
+    (no el primero de la lista): se busca patrón por patrón, precompilados.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self._patterns = patterns
+        self._compiled = None
+        self._combined = None
+        # "^a|b" no está anclado entero: b matchea en cualquier posición
+        if patterns and all(p.startswith("^") and not _has_top_level_alternation(p) for p in patterns):
+            body = "|".join(f"(?P<f{i}>{p[1:]})" for i, p in enumerate(patterns))
+            self._combined = re.compile(f"^(?:{body})")
+        else:
+            self._compiled = [(p, re.compile(p)) for p in patterns]
+
+    def first_match(self, text_lower: str) -> Optional[str]:
+        if self._combined is None:
+            for pattern, regex in self._compiled:
+                if regex.search(text_lower):
+                    return pattern
+            return None
+        m = self._combined.match(text_lower)
+        if m is None:
+            return None
+        for i, pattern in enumerate(self._patterns):
+            if m.group(f"f{i}") is not None:
+                return pattern
+        return None
+
+
+COGNITIVE_SCANNER = CognitiveScanner(COGNITIVE_PATTERNS)
+FORBIDDEN_SCANNER = ForbiddenScanner(FORBIDDEN_PATTERNS)
+
+
+_CONFIDENCE_BUCKETS = {
+    "high_confidence": "high",
+    "moderate_confidence": "moderate",
+    "low_confidence": "low",
+}
+
+
 class CognitiveLogger:
-    """Registra comportamiento cognitivo del LLM para análisis."""
+    """
+    Registra comportamiento cognitivo del LLM para análisis.
 
-    def __init__(self):
-        self.logs: List[Dict[str, Any]] = []
+    Memoria constante: contadores agregados que se actualizan al insertar
+    (get_summary es O(1)) + ring buffer opcional con las entradas recientes.
+    Cada entrada se entrega además a `sink` (p.ej. el writer en batch a BD).
+    """
 
-    def analyze_response(self, response_text: str, context: dict) -> Dict[str, Any]:
+    def __init__(self, max_recent: int = COGNITIVE_LOG_RECENT, sink=None):
+        self.sink = sink
+        self.logs: "deque[Dict[str, Any]]" = deque(maxlen=max(0, max_recent))
+        self._total = 0
+        self._marker_sums = {
+            "uncertainty_markers": 0,
+            "contradiction_markers": 0,
+            "overgeneralization_markers": 0,
+            "fabrication_markers": 0,
+        }
+        self._response_length_sum = 0
+        self._confidence = {"high": 0, "moderate": 0, "low": 0}
+
+    def analyze_response(
+        self, response_text: str, context: dict, model: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Analiza la respuesta buscando patrones cognitivos."""
         findings = {
             "timestamp": datetime.now().isoformat(),
@@ -140,26 +330,9 @@ class CognitiveLogger:
 
         text_lower = response_text.lower()
 
-        # Buscar patrones
-        for pattern in COGNITIVE_PATTERNS["uncertainty"]:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                findings["uncertainty_markers"].extend(matches)
-
-        for pattern in COGNITIVE_PATTERNS["contradiction"]:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                findings["contradiction_markers"].extend(matches)
-
-        for pattern in COGNITIVE_PATTERNS["overgeneralization"]:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                findings["overgeneralization_markers"].extend(matches)
-
-        for pattern in COGNITIVE_PATTERNS["fabrication_markers"]:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                findings["fabrication_markers"].extend(matches)
+        # Buscar patrones (todas las categorías en una pasada)
+        for category, matches in COGNITIVE_SCANNER.scan(text_lower).items():
+            findings[_FINDING_KEYS[category]].extend(matches)
 
         # Evaluar confianza general
         uncertainty_count = len(findings["uncertainty_markers"])
@@ -173,30 +346,87 @@ class CognitiveLogger:
         # Agregar al log
         log_entry = {
             **findings,
-            "context_hash": hash(json.dumps(context, sort_keys=True)),
+            # Estable entre procesos (hash() de Python cambia en cada arranque)
+            "context_hash": hashlib.sha256(
+                json.dumps(context, sort_keys=True, default=str).encode("utf-8")
+            ).hexdigest(),
             "response_length": len(response_text),
+            "model_name": model,
         }
-        self.logs.append(log_entry)
+        self._record(log_entry)
 
         return findings
 
+    def _record(self, log_entry: Dict[str, Any]) -> None:
+        """Actualiza agregados y ring buffer (O(1))."""
+        self._total += 1
+        for key in self._marker_sums:
+            self._marker_sums[key] += len(log_entry[key])
+        self._response_length_sum += log_entry["response_length"]
+        bucket = _CONFIDENCE_BUCKETS.get(log_entry["confidence_assessment"])
+        if bucket is not None:
+            self._confidence[bucket] += 1
+        if self.logs.maxlen:
+            self.logs.append(log_entry)
+        if self.sink is not None:
+            try:
+                self.sink(log_entry)
+            except Exception as e:
+                print(f"[COGNITIVE_LOG] sink falló: {e}")
+
+    def get_recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Últimas entradas crudas (más reciente primero)."""
+        return list(self.logs)[-limit:][::-1] if limit > 0 else []
+
     def get_summary(self) -> Dict[str, Any]:
-        """Resumen del comportamiento cognitivo observado."""
-        if not self.logs:
+        """Resumen del comportamiento cognitivo observado (O(1))."""
+        if not self._total:
             return {"total_analyses": 0}
 
+        total = self._total
         return {
-            "total_analyses": len(self.logs),
-            "avg_uncertainty_markers": sum(len(l["uncertainty_markers"]) for l in self.logs) / len(self.logs),
-            "total_fabrication_flags": sum(len(l["fabrication_markers"]) for l in self.logs),
-            "confidence_distribution": {
-                "high": sum(1 for l in self.logs if l["confidence_assessment"] == "high_confidence"),
-                "moderate": sum(1 for l in self.logs if l["confidence_assessment"] == "moderate_confidence"),
-                "low": sum(1 for l in self.logs if l["confidence_assessment"] == "low_confidence"),
-            }
+            "total_analyses": total,
+            "avg_uncertainty_markers": self._marker_sums["uncertainty_markers"] / total,
+            "avg_contradiction_markers": self._marker_sums["contradiction_markers"] / total,
+            "avg_overgeneralization_markers": self._marker_sums["overgeneralization_markers"] / total,
+            "total_fabrication_flags": self._marker_sums["fabrication_markers"],
+            "avg_response_length": round(self._response_length_sum / total, 1),
+            "confidence_distribution": dict(self._confidence),
+            "recent_kept": len(self.logs),
         }
 
 
+def _default_cognitive_sink():
+    """Writer en batch a BD (import diferido: el observer no depende de la BD)."""
+    from backend.app.services.cognitive_log_writer import (
+        COGNITIVE_LOG_PERSIST,
+        get_cognitive_log_writer,
+    )
+    return get_cognitive_log_writer().enqueue if COGNITIVE_LOG_PERSIST else None
+
+
+def observer_messages(context_text: str) -> List[Dict[str, str]]:
+    """Mensajes /api/chat: system fijo (prefijo cacheable) + contexto variable."""
+    return [
+        {"role": "system", "content": PROMPT_OBSERVER},
+        {"role": "user", "content": f"---\n{context_text}\n---\n\nJSON:"},
+    ]
+
+
+# Cache global de análisis (content-addressed)
+_result_cache = LRUCache(max_size=OBSERVER_CACHE_SIZE, ttl_s=OBSERVER_CACHE_TTL_S)
+
+# Análisis en vuelo: requests idénticos concurrentes comparten una sola inferencia
+_inflight_analyses = SingleFlight()
+
+
+def _cache_key(model: str, context_text: str) -> str:
+    """Hash estable del prompt normalizado (espacios colapsados) + modelo."""
+    normalized = " ".join(context_text.split())
+    raw = f"{model}\n{PROMPT_OBSERVER}\n{normalized}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
 class ObserverAgent:
     """
     Agente observador para análisis cognitivo clínico.
@@ -208,16 +438,22 @@ class ObserverAgent:
         model: str = OLLAMA_MODEL,
         base_url: str = OLLAMA_BASE_URL,
         timeout: float = OLLAMA_TIMEOUT,
+        result_cache: Optional[LRUCache] = None,
+        use_chat: bool = OBSERVER_USE_CHAT,
     ):
         self.model = model
         self.base_url = base_url
         self.timeout = timeout
-        self.cognitive_logger = CognitiveLogger()
+        self.use_chat = use_chat
+        self.cognitive_logger = CognitiveLogger(sink=_default_cognitive_sink())
+        self.result_cache = result_cache if result_cache is not None else _result_cache
+        self.inflight = _inflight_analyses
 
-    def analyze(self, patient_context: dict) -> dict:
+    async def analyze(self, patient_context: dict, force: bool = False) -> dict:
         """
         Contraste clínico: amplía el razonamiento del médico.
         Solo se activa con contexto suficiente (anamnesis).
+        force=True ignora el cache y lo reemplaza con el resultado nuevo.
         """
         # Sanitizar entrada
         if not patient_context or not isinstance(patient_context, dict):
@@ -240,9 +476,27 @@ class ObserverAgent:
         # Preparar contexto
         context_text = self._format_context(patient_context)
 
-        # Llamar a Ollama
+        # Cache: mismo prompt normalizado + modelo → mismo resultado
+        cache_key = _cache_key(self.model, context_text)
+        cached = None if force else self.result_cache.get(cache_key)
+        if cached is not None:
+            result = copy.deepcopy(cached)
+            result["metrics"]["cache_hit"] = True
+            result["clinical_phase"] = patient_context.get("clinical_phase", "experimental")
+            return result
+
+        # Single-flight: misma clave en vuelo → esperar esa inferencia
+        result = copy.deepcopy(await self.inflight.do(
+            cache_key,
+            lambda: self._analyze_uncached(patient_context, context_text, cache_key),
+        ))
+        result["clinical_phase"] = patient_context.get("clinical_phase", "experimental")
+        return result
+
+    async def _analyze_uncached(self, patient_context: dict, context_text: str, cache_key: str) -> dict:
+        """Llama a Ollama, valida, parsea y cachea el resultado."""
         try:
-            raw_response, metrics = self._call_ollama(context_text)
+            raw_response, metrics = await self._call_ollama(context_text)
 
             # Validar respuesta (sin patrones prohibidos)
             is_valid, validation_error = self._validate_response(raw_response)
@@ -261,7 +515,7 @@ class ObserverAgent:
 
             # Análisis cognitivo
             cognitive_analysis = self.cognitive_logger.analyze_response(
-                raw_response, patient_context
+                raw_response, patient_context, model=self.model
             )
             result["cognitive_behavior"] = cognitive_analysis
             result["metrics"] = metrics
@@ -270,6 +524,10 @@ class ObserverAgent:
                 result["llm_status"] = "ok"
             result["mode"] = "observer"
 
+            # Solo se cachean respuestas útiles del LLM
+            if result["llm_status"] == "ok" and "validation_error" not in result:
+                self.result_cache.set(cache_key, copy.deepcopy(result))
+
         except httpx.ConnectError:
             result = self._error_response(
                 "error",
@@ -283,7 +541,6 @@ class ObserverAgent:
         except Exception as e:
             result = self._error_response("error", str(e))
 
-        result["clinical_phase"] = patient_context.get("clinical_phase", "experimental")
         return result
 
     def _error_response(self, status: str, message: str) -> dict:
@@ -340,45 +597,65 @@ class ObserverAgent:
         has_clinical_text = bool(safe_str(patient_context.get("clinical_text")))
         return has_clinical_text
 
-    def _call_ollama(self, context_text: str) -> Tuple[str, dict]:
-        """Llama a Ollama API. Retorna (response, metrics)."""
-        url = f"{self.base_url}/api/generate"
+    def _build_request(self, context_text: str) -> Tuple[str, dict]:
+        """
+        Arma (url, payload). En modo chat el system message es idéntico en
+        cada request: Ollama reutiliza el KV-cache de ese prefijo mientras
+        el modelo siga cargado (keep_alive).
+        """
+        options = {
+            "num_predict": 400,  # Límite ~400 tokens
+            "temperature": 0.3,  # Más determinista
+        }
 
-        prompt = f"{PROMPT_OBSERVER}\n\n---\n{context_text}\n---\n\nJSON:"
+        if self.use_chat:
+            return f"{self.base_url}/api/chat", {
+                "model": self.model,
+                "messages": observer_messages(context_text),
+                "stream": False,
+                "format": "json",
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "options": options,
+            }
 
-        payload = {
+        prompt = f"{PROMPT_OBSERVER}\n\n---\n{context_text}\n---\n\nJSON:"
+        return f"{self.base_url}/api/generate", {
             "model": self.model,
             "prompt": prompt,
             "stream": False,
             "format": "json",
-            "options": {
-                "num_predict": 400,  # Límite ~400 tokens
-                "temperature": 0.3,  # Más determinista
-            }
+            "options": options,
         }
 
+    async def _call_ollama(self, context_text: str) -> Tuple[str, dict]:
+        """Llama a Ollama API (cliente compartido). Retorna (response, metrics)."""
+        url, payload = self._build_request(context_text)
+
         start_time = time.time()
-        with httpx.Client(timeout=self.timeout) as client:
-            response = client.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
+        client = get_ollama_client()
+        response = await client.post(url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
 
         elapsed = time.time() - start_time
         metrics = {
             "response_time_ms": int(elapsed * 1000),
             "eval_count": data.get("eval_count", 0),
             "prompt_eval_count": data.get("prompt_eval_count", 0),
+            "prompt_eval_ms": int(data.get("prompt_eval_duration", 0) / 1_000_000),
             "model_name": self.model,
+            "api": "chat" if self.use_chat else "generate",
         }
 
+        if self.use_chat:
+            return (data.get("message") or {}).get("content", "{}"), metrics
         return data.get("response", "{}"), metrics
 
     def _validate_response(self, response_text: str) -> Tuple[bool, str]:
         """Valida que la respuesta no contenga patrones prohibidos."""
-        text_lower = response_text.lower()
-        for pattern in FORBIDDEN_PATTERNS:
-            if re.search(pattern, text_lower):
-                return False, f"Patrón prohibido: {pattern}"
+        pattern = FORBIDDEN_SCANNER.first_match(response_text.lower())
+        if pattern is not None:
+            return False, f"Patrón prohibido: {pattern}"
         return True, ""
 
     def _normalize_list(self, value) -> list:
@@ -460,44 +737,120 @@ class ObserverAgent:
         """Obtiene resumen del comportamiento cognitivo."""
         return self.cognitive_logger.get_summary()
 
+    def get_cognitive_recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Últimas entradas del log cognitivo."""
+        return self.cognitive_logger.get_recent(limit)
+
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """Métricas del cache de resultados (hits / misses / desalojos) y single-flight."""
+        return {**self.result_cache.metrics(), "single_flight": self.inflight.metrics()}
+
 
 # =========================
 # THROTTLING HELPER
 # =========================
+class _SessionThrottleState:
+    """Estado de throttling de una sesión (clínico / procedimiento)."""
+
+    __slots__ = ("lock", "last_analysis_time", "last_context", "cached_result", "launched", "applied")
+
+    def __init__(self):
+        # Protege solo la decisión de throttling y la actualización del estado,
+        # nunca la inferencia
+        self.lock = asyncio.Lock()
+        self.last_analysis_time: float = 0
+        # Contexto que produjo cached_result (base del diff incremental)
+        self.last_context: Optional[dict] = None
+        self.cached_result: Optional[Dict[str, Any]] = None
+        # Secuencia de análisis lanzados / aplicados: uno lento no pisa a uno más nuevo
+        self.launched = 0
+        self.applied = 0
+
+
 class ThrottledObserver:
-    """Wrapper con throttling para el ObserverAgent."""
+    """
+    Wrapper con throttling para el ObserverAgent.
+    El estado (debounce + último resultado) es por sesión: un clínico
+    nunca recibe ni suprime el análisis de otro.
+
+    Modo incremental: solo se re-analiza si el diff semántico contra el
+    último contexto analizado es material (ver context_delta.py); los
+    cambios triviales reutilizan el resultado estructurado previo.
+    """
+
+    DEFAULT_SESSION = "default"
 
     def __init__(
         self,
         observer: Optional[ObserverAgent] = None,
         min_interval: float = 2.0,
-        min_chars_change: int = 20,
+        max_sessions: int = OBSERVER_MAX_SESSIONS,
+        session_ttl_s: float = OBSERVER_SESSION_TTL_S,
     ):
         self.observer = observer or ObserverAgent()
         self.min_interval = min_interval
-        self.min_chars_change = min_chars_change
-        self._last_analysis_time: float = 0
-        self._last_context_str: str = ""
-        self._cached_result: Optional[Dict[str, Any]] = None
-
-    def analyze(self, patient_context: dict, force: bool = False) -> dict:
-        """Analiza con throttling."""
-        current_time = time.time()
-        context_str = json.dumps(patient_context, sort_keys=True)
-
-        time_elapsed = current_time - self._last_analysis_time
-        chars_changed = abs(len(context_str) - len(self._last_context_str))
+        # session_id -> _SessionThrottleState (LRU acotado + TTL de inactividad)
+        self._sessions = LRUCache(max_size=max_sessions, ttl_s=session_ttl_s)
+
+    def _session(self, session_id: Optional[str]) -> _SessionThrottleState:
+        key = session_id or self.DEFAULT_SESSION
+        state = self._sessions.get(key)
+        if state is None:
+            state = _SessionThrottleState()
+        # Re-insertar renueva el TTL de la sesión activa
+        self._sessions.set(key, state)
+        return state
+
+    async def analyze(
+        self,
+        patient_context: dict,
+        force: bool = False,
+        session_id: Optional[str] = None,
+    ) -> dict:
+        """Analiza con throttling por sesión."""
+        state = self._session(session_id)
+
+        # El lock cubre solo la decisión: la inferencia corre fuera, y las
+        # llamadas idénticas concurrentes se fusionan en el SingleFlight del observer
+        async with state.lock:
+            current_time = time.time()
+            time_elapsed = current_time - state.last_analysis_time
+
+            delta = diff_contexts(state.last_context, patient_context)
+
+            # Un error previo nunca se reutiliza
+            last_failed = bool(state.cached_result) and state.cached_result.get("llm_status") == "error"
+
+            # Cambios solo de texto libre respetan el debounce; los estructurales no
+            should_execute = force or last_failed or (
+                delta.material and (delta.structural or time_elapsed >= self.min_interval)
+            )
 
-        should_execute = force or (
-            time_elapsed >= self.min_interval or chars_changed >= self.min_chars_change
-        )
+            if should_execute:
+                # El debounce corre desde el lanzamiento, no desde la respuesta
+                state.last_analysis_time = current_time
+                state.launched += 1
+                sequence = state.launched
+                cached_result = None
+            elif state.cached_result is not None:
+                # Reutiliza el análisis previo (la base del diff no se mueve)
+                cached_result = copy.deepcopy(state.cached_result)
+                cached_result["incremental"] = {"reused": True, **delta.as_dict()}
+                cached_result["clinical_phase"] = patient_context.get(
+                    "clinical_phase", cached_result.get("clinical_phase")
+                )
+            else:
+                cached_result = None
 
-        if should_execute and (context_str != self._last_context_str or force):
-            self._cached_result = self.observer.analyze(patient_context)
-            self._last_analysis_time = current_time
-            self._last_context_str = context_str
+        if should_execute:
+            cached_result = await self.observer.analyze(patient_context, force=force)
+            async with state.lock:
+                if sequence > state.applied:
+                    state.applied = sequence
+                    state.cached_result = cached_result
+                    state.last_context = dict(patient_context)
 
-        return self._cached_result or {
+        return cached_result or {
             "insufficient": True,
             "missing": ["Esperando contexto clínico"],
             "high_impact": [],
@@ -510,10 +863,22 @@ class ThrottledObserver:
             "mode": "observer",
         }
 
+    def get_session_metrics(self) -> Dict[str, Any]:
+        """Métricas del mapa de sesiones (tamaño, desalojos)."""
+        return self._sessions.metrics()
+
     def get_cognitive_summary(self) -> Dict[str, Any]:
         """Obtiene resumen cognitivo del observer interno."""
         return self.observer.get_cognitive_summary()
 
+    def get_cognitive_recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Últimas entradas del log cognitivo del observer interno."""
+        return self.observer.get_cognitive_recent(limit)
+
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """Métricas del cache de resultados del observer interno."""
+        return self.observer.get_cache_metrics()
+
 
 # =========================
 # INSTANCIA GLOBAL
@@ -530,28 +895,39 @@ def get_observer() -> ThrottledObserver:
     return _default_observer
 
 
-def warmup_ollama() -> dict:
+async def warmup_ollama() -> dict:
     """
     Calienta el modelo Ollama con una consulta simple.
     Llamar al iniciar el backend para reducir latencia del primer request real.
+    En modo chat además pre-evalúa el system prompt del observer (KV-cache).
     """
     global _warmup_done
     if _warmup_done:
         return {"status": "already_warm"}
 
-    url = f"{OLLAMA_BASE_URL}/api/generate"
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": "Responde OK",
-        "stream": False,
-        "options": {"num_predict": 5}
-    }
+    if OBSERVER_USE_CHAT:
+        url = f"{OLLAMA_BASE_URL}/api/chat"
+        payload = {
+            "model": OLLAMA_MODEL,
+            "messages": observer_messages("Responde OK"),
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {"num_predict": 1}
+        }
+    else:
+        url = f"{OLLAMA_BASE_URL}/api/generate"
+        payload = {
+            "model": OLLAMA_MODEL,
+            "prompt": "Responde OK",
+            "stream": False,
+            "options": {"num_predict": 5}
+        }
 
     try:
         start = time.time()
-        with httpx.Client(timeout=60.0) as client:
-            response = client.post(url, json=payload)
-            response.raise_for_status()
+        client = get_ollama_client()
+        response = await client.post(url, json=payload, timeout=60.0)
+        response.raise_for_status()
         elapsed = time.time() - start
         _warmup_done = True
         print(f"[WARMUP] Ollama {OLLAMA_MODEL} listo en {elapsed:.1f}s")
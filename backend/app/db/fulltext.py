@@ -0,0 +1,146 @@
+"""
+fulltext.py
+
+Búsqueda de texto completo sobre voice_events.raw_text y memory_nodes.content.
+
+- Postgres: columna search_vector (tsvector nullable, configuración
+  SEARCH_TS_CONFIG) mantenida por un trigger BEFORE INSERT/UPDATE.
+  Sin columna generada: agregarla reescribiría la tabla con lock
+  ACCESS EXCLUSIVE. En tablas existentes ensure_fulltext() hace, online:
+    1. ADD COLUMN nullable (solo catálogo, con lock_timeout)
+    2. trigger (filas nuevas)
+    3. backfill por batches de FULLTEXT_BACKFILL_BATCH filas, un commit
+       por batch (filas previas; mientras tanto no aparecen en /search)
+  El GIN lo crea ensure_indexes() con CONCURRENTLY
+- SQLite (LAB): tablas virtuales FTS5 de contenido externo + triggers
+  que las mantienen al día. Si la tabla FTS es nueva se reconstruye
+  desde la tabla base
+"""
+
+import os
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Configuración de text search de Postgres (stemming + stopwords en español)
+SEARCH_TS_CONFIG = "spanish"
+
+FULLTEXT_BACKFILL_BATCH = int(os.getenv("FULLTEXT_BACKFILL_BATCH", "5000"))
+# ADD COLUMN / CREATE TRIGGER: no quedar en cola detrás de transacciones largas
+FULLTEXT_LOCK_TIMEOUT = os.getenv("FULLTEXT_LOCK_TIMEOUT", "5s")
+
+# Tabla base → columna de texto indexada
+FULLTEXT_SOURCES = {
+    "voice_events": "raw_text",
+    "memory_nodes": "content",
+}
+
+
+def search_vector_sql(column: str) -> str:
+    """Expresión tsvector (trigger y backfill)."""
+    return f"to_tsvector('{SEARCH_TS_CONFIG}', {column})"
+
+
+def fts_table(table: str) -> str:
+    return f"{table}_fts"
+
+
+def _sqlite_statements(table: str, column: str) -> list:
+    fts = fts_table(table)
+    return [
+        # remove_diacritics: "evolucion" encuentra "evolución"
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='rowid', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.rowid, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.rowid, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); END",
+    ]
+
+
+def _postgres_function(table: str, column: str) -> str:
+    return (
+        f"CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$ "
+        f"BEGIN NEW.search_vector := {search_vector_sql('NEW.' + column)}; RETURN NEW; END "
+        f"$$ LANGUAGE plpgsql"
+    )
+
+
+def _postgres_fulltext(engine: Engine, table: str, column: str, results: Dict[str, str]) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{FULLTEXT_LOCK_TIMEOUT}'"))
+        generated = conn.execute(text(
+            "SELECT is_generated FROM information_schema.columns "
+            "WHERE table_schema = current_schema() "
+            "AND table_name = :table AND column_name = 'search_vector'"
+        ), {"table": table}).scalar()
+        if generated == "ALWAYS":
+            # Columna generada de una versión anterior: ya está completa
+            results[f"{table}.search_vector"] = "generated"
+            return
+        if generated is None:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+            results[f"{table}.search_vector"] = "added"
+        else:
+            results[f"{table}.search_vector"] = "ensured"
+
+        conn.execute(text(_postgres_function(table, column)))
+        trigger = f"{table}_search_vector_trg"
+        exists = conn.execute(text(
+            "SELECT 1 FROM pg_trigger WHERE tgname = :name AND NOT tgisinternal"
+        ), {"name": trigger}).first()
+        if exists is None:
+            conn.execute(text(
+                f"CREATE TRIGGER {trigger} BEFORE INSERT OR UPDATE OF {column} ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update()"
+            ))
+
+    # Backfill: batches cortos (locks de fila, sin bloquear la tabla)
+    backfilled = 0
+    batch = text(
+        f"UPDATE {table} SET search_vector = {search_vector_sql(column)} "
+        f"WHERE id IN (SELECT id FROM {table} WHERE search_vector IS NULL AND {column} IS NOT NULL "
+        f"LIMIT :batch FOR UPDATE SKIP LOCKED)"
+    )
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(batch, {"batch": FULLTEXT_BACKFILL_BATCH}).rowcount
+        backfilled += updated
+        if updated < FULLTEXT_BACKFILL_BATCH:
+            break
+    if backfilled:
+        results[f"{table}.search_vector"] += f", backfilled {backfilled}"
+
+
+def ensure_fulltext(engine: Engine) -> Dict[str, str]:
+    """Prepara la búsqueda de texto completo. Retorna {objeto: acción}."""
+    results: Dict[str, str] = {}
+
+    if engine.dialect.name == "postgresql":
+        for table, column in FULLTEXT_SOURCES.items():
+            _postgres_fulltext(engine, table, column, results)
+        return results
+
+    if engine.dialect.name != "sqlite":
+        return results
+
+    with engine.begin() as conn:
+        for table, column in FULLTEXT_SOURCES.items():
+            fts = fts_table(table)
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {"name": fts}).first()
+            for statement in _sqlite_statements(table, column):
+                conn.execute(text(statement))
+            if existed is None:
+                # Filas previas a los triggers
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                results[fts] = "built"
+            else:
+                results[fts] = "ensured"
+    return results
@@ -0,0 +1,106 @@
+"""
+migrations.py
+
+Índices sobre tablas ya existentes.
+
+create_all() crea tablas nuevas con sus índices, pero no agrega índices
+a tablas que ya existen. ensure_indexes() aplica los índices declarados
+en los modelos (Base.metadata) sin bloquear escrituras:
+
+- Postgres: CREATE INDEX CONCURRENTLY IF NOT EXISTS (fuera de
+  transacción). Un índice INVALID que quedó de un intento anterior
+  interrumpido se elimina y se vuelve a crear
+- SQLite (LAB): CREATE INDEX IF NOT EXISTS
+
+Antes de los índices se prepara la búsqueda de texto completo
+(ensure_fulltext: columna search_vector + trigger + backfill por batches
+en Postgres, FTS5 en SQLite). Tampoco bloquea la tabla.
+
+Uso manual (recomendado en Postgres con muchos datos):
+    python -m backend.app.db.migrations [--drop-redundant]
+
+En el startup corre en background si DB_ENSURE_INDEXES=1 (default).
+"""
+
+import argparse
+import os
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from backend.app.db.base import Base
+from backend.app.db.fulltext import ensure_fulltext
+
+DB_ENSURE_INDEXES = os.getenv("DB_ENSURE_INDEXES", "1") not in ("0", "false", "False")
+
+# Índices de una sola columna que quedaron cubiertos por un compuesto
+REDUNDANT_INDEXES = (
+    "ix_voice_events_procedure_id",
+    "ix_memory_nodes_user_id",
+)
+
+
+def _index_statements(postgres: bool) -> List[tuple]:
+    concurrently = "CONCURRENTLY " if postgres else ""
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            columns = ", ".join(c.name for c in index.columns)
+            unique = "UNIQUE " if index.unique else ""
+            using = index.dialect_options["postgresql"]["using"] if postgres else None
+            method = f"USING {using} " if using else ""
+            statements.append((
+                index.name,
+                f"CREATE {unique}INDEX {concurrently}IF NOT EXISTS {index.name} "
+                f"ON {table.name} {method}({columns})",
+            ))
+    return statements
+
+
+def _invalid_indexes(conn) -> set:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE NOT i.indisvalid"
+    ))
+    return {r[0] for r in rows}
+
+
+def ensure_indexes(engine: Engine, drop_redundant: bool = False) -> Dict[str, str]:
+    """Crea los índices declarados que falten. Retorna {índice: acción}."""
+    postgres = engine.dialect.name == "postgresql"
+    # La columna search_vector debe existir antes de su índice GIN
+    results: Dict[str, str] = ensure_fulltext(engine)
+
+    # CONCURRENTLY no puede correr dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = _invalid_indexes(conn) if postgres else set()
+        for name, statement in _index_statements(postgres):
+            if name in invalid:
+                conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if postgres else ''}IF EXISTS {name}"))
+                results[name] = "rebuilt"
+            conn.execute(text(statement))
+            results.setdefault(name, "ensured")
+
+        if drop_redundant:
+            for name in REDUNDANT_INDEXES:
+                conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if postgres else ''}IF EXISTS {name}"))
+                results[name] = "dropped"
+
+    return results
+
+
+if __name__ == "__main__":
+    from backend.app.db.session import engine
+    from backend.app.models import voice_event, memory_node, core, cognitive_log, memory_embedding  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="Aplica índices de los modelos a tablas existentes")
+    parser.add_argument(
+        "--drop-redundant",
+        action="store_true",
+        help="Elimina índices de una columna cubiertos por los compuestos",
+    )
+    args = parser.parse_args()
+    for name, action in ensure_indexes(engine, drop_redundant=args.drop_redundant).items():
+        print(f"{name}: {action}")
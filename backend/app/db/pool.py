@@ -0,0 +1,185 @@
+"""
+pool.py
+
+Pool de conexiones configurable por entorno + métricas de espera en checkout.
+
+- DB_POOL_SIZE / DB_MAX_OVERFLOW: conexiones persistentes / extra en picos.
+  Dimensionar contra INFERENCE_WORKERS (cada worker puede tener una
+  sesión abierta) mirando checkout_wait en /lab/status
+- DB_POOL_TIMEOUT: segundos máximos esperando una conexión libre
+- DB_POOL_RECYCLE: segundos de vida de una conexión (-1 = sin reciclar)
+- DB_POOL_PRE_PING: "auto" (default: solo Postgres), "1" o "0".
+  Pre-ping agrega un round trip por checkout; con pool_recycle menor al
+  idle timeout del servidor/proxy suele no hacer falta
+- SQLite (LAB): PRAGMAs por conexión vía evento "connect":
+  DB_SQLITE_JOURNAL_MODE (WAL), DB_SQLITE_SYNCHRONOUS (NORMAL),
+  DB_SQLITE_BUSY_TIMEOUT_MS (5000). En WAL los lectores no bloquean al
+  escritor y un escritor espera busy_timeout en vez de fallar con
+  "database is locked"
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "auto")
+
+DB_SQLITE_JOURNAL_MODE = os.getenv("DB_SQLITE_JOURNAL_MODE", "WAL")
+DB_SQLITE_SYNCHRONOUS = os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL")
+DB_SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Checkouts recientes para percentiles
+_WAIT_WINDOW = 1024
+
+
+class CheckoutStats:
+    """Tiempo que el caller espera por una conexión (cola + creación + pre-ping)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent: "deque[float]" = deque(maxlen=_WAIT_WINDOW)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_ms += wait_ms
+            self.max_ms = max(self.max_ms, wait_ms)
+            self._recent.append(wait_ms)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+            checkouts, timeouts, total_ms, max_ms = (
+                self.checkouts, self.timeouts, self.total_ms, self.max_ms
+            )
+
+        def pct(p: float) -> float:
+            if not recent:
+                return 0.0
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))], 3)
+
+        return {
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "avg_ms": round(total_ms / checkouts, 3) if checkouts else 0.0,
+            "p50_ms": pct(0.5),
+            "p99_ms": pct(0.99),
+            "max_ms": round(max_ms, 3),
+        }
+
+
+class _TimedCheckoutMixin:
+    """Mide cada checkout del pool. Las stats sobreviven a pool.recreate()."""
+
+    checkout_stats: CheckoutStats
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.checkout_stats.record_timeout()
+            raise
+        self.checkout_stats.record((time.perf_counter() - t0) * 1000)
+        return conn
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.checkout_stats = self.checkout_stats
+        return new_pool
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+
+class TimedNullPool(_TimedCheckoutMixin, NullPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+
+def engine_options(url: str, is_async: bool) -> Dict[str, Any]:
+    """kwargs de create_engine / create_async_engine según el entorno."""
+    sqlite = url.startswith("sqlite")
+    if sqlite and ":memory:" in url:
+        # Memoria: cada conexión es otra BD, se deja el pool por defecto
+        return {}
+
+    if DB_POOL_PRE_PING == "auto":
+        pre_ping = not sqlite
+    else:
+        pre_ping = DB_POOL_PRE_PING not in ("0", "false", "False")
+
+    if sqlite and is_async:
+        # aiosqlite: una conexión (= un thread) por checkout, como el default
+        # de SQLAlchemy. Abrir un archivo SQLite es barato, y una conexión
+        # pooleada queda ligada al event loop que la creó
+        return {"poolclass": TimedNullPool, "pool_pre_ping": pre_ping}
+
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": pre_ping,
+    }
+
+
+def configure_sqlite(engine: Engine) -> None:
+    """PRAGMAs por conexión nueva (engine sync o async_engine.sync_engine)."""
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {DB_SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA journal_mode = {DB_SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous = {DB_SQLITE_SYNCHRONOUS}")
+        finally:
+            cursor.close()
+
+
+def pool_metrics(engine: Engine) -> Dict[str, Any]:
+    """Estado del pool + espera en checkout (para dimensionarlo)."""
+    pool = engine.pool
+    metrics: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    stats = getattr(pool, "checkout_stats", None)
+    if stats is not None:
+        metrics["checkout_wait"] = stats.snapshot()
+    return metrics
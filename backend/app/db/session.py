@@ -1,10 +1,14 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Después de load_dotenv: pool.py lee DB_POOL_* / DB_SQLITE_* del entorno
+from backend.app.db.pool import configure_sqlite, engine_options, pool_metrics
+
 # DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Manejo seguro para LAB: Fallback a SQLite si no hay configuración
@@ -19,10 +23,28 @@ else:
     DATABASE_URL = raw_db_url
     connect_args = {}
 
+
+def to_async_url(url: str) -> str:
+    """
+    URL sync → driver async:
+    - sqlite:///...            → sqlite+aiosqlite:///...
+    - postgres(ql)[+psycopg]:// → postgresql+psycopg:// (psycopg 3 async)
+    """
+    scheme, sep, rest = url.partition("://")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg", "postgresql+psycopg2"):
+        return f"postgresql+psycopg{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+# Engine sync: DDL de startup, migraciones de índices y scripts/benchmarks
 engine = create_engine(
     DATABASE_URL,
     connect_args=connect_args,
-    pool_pre_ping=True,
+    **engine_options(DATABASE_URL, is_async=False),
 )
 
 SessionLocal = sessionmaker(
@@ -31,6 +53,32 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+# Engine async: rutas FastAPI (ninguna I/O de BD bloquea el event loop)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(ASYNC_DATABASE_URL, is_async=True),
+)
+
+if DATABASE_URL.startswith("sqlite"):
+    # WAL + synchronous=NORMAL + busy_timeout en cada conexión nueva
+    configure_sqlite(engine)
+    configure_sqlite(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    # Los objetos siguen legibles después del commit (sin lazy-load implícito)
+    expire_on_commit=False,
+)
+
+def get_pool_metrics() -> dict:
+    """Pools sync y async: tamaño, uso y espera en checkout."""
+    return {
+        "sync": pool_metrics(engine),
+        "async": pool_metrics(async_engine.sync_engine),
+    }
+
+
 # ✅ NUEVO: dependency-compatible helper
 def get_db():
     db = SessionLocal()
@@ -38,3 +86,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency FastAPI: AsyncSession por request."""
+    async with AsyncSessionLocal() as db:
+        yield db
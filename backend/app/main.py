@@ -3,10 +3,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # DB: Base y engine para inicialización de tablas
 from backend.app.db.base import Base
-from backend.app.db.session import engine
+from backend.app.db.session import async_engine, engine
 
 # Modelos (importar para registrar en Base.metadata)
-from backend.app.models import voice_event, memory_node, core  # noqa: F401
+from backend.app.models import voice_event, memory_node, core, cognitive_log, memory_embedding  # noqa: F401
 
 # =========================
 # APP INIT
@@ -32,19 +32,74 @@ app.add_middleware(
 # STARTUP: Crear tablas + warmup Ollama
 # =========================
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """Crea las tablas en la BD si no existen (checkfirst=True por defecto)."""
-    Base.metadata.create_all(bind=engine)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # Índices nuevos sobre tablas ya existentes (CONCURRENTLY en Postgres, en background)
+    import asyncio
+    from backend.app.db.migrations import DB_ENSURE_INDEXES
+    if DB_ENSURE_INDEXES:
+        asyncio.create_task(_ensure_indexes_background())
+
+    # Cliente HTTP compartido para Ollama (pool + keep-alive)
+    from backend.app.services.ollama_client import start_ollama_client
+    await start_ollama_client()
 
     # Warmup Ollama en background (no bloquea startup)
-    import threading
     from backend.agents.observer_agent import warmup_ollama
-    threading.Thread(target=warmup_ollama, daemon=True).start()
+    asyncio.create_task(warmup_ollama())
+
+    # Writer en batch de logs cognitivos (flush por tamaño/tiempo)
+    from backend.app.services.cognitive_log_writer import get_cognitive_log_writer
+    get_cognitive_log_writer().start()
+
+    # Writer en batch de voice_events / memory_nodes (ventana EVENT_WRITE_WINDOW_MS)
+    from backend.app.services.event_writer import get_event_writer
+    get_event_writer().start()
+
+    # Embeddings de memoria LIFE en background (recall semántico)
+    from backend.app.services.memory_recall import get_memory_recall
+    get_memory_recall().start()
 
     # Iniciar Supervisor de Tasks (12s loop)
     from backend.app.routes.lab import start_supervisor
     start_supervisor()
 
+
+async def _ensure_indexes_background():
+    import asyncio
+    from backend.app.db.migrations import ensure_indexes
+    try:
+        results = await asyncio.to_thread(ensure_indexes, engine)
+        print(f"[DB] Índices verificados: {', '.join(results)}")
+    except Exception as e:
+        print(f"[DB] No se pudieron verificar índices: {e}")
+
+
+# =========================
+# SHUTDOWN: Cancelar inferencias + drenar logs y eventos + cerrar pool HTTP Ollama
+# =========================
+@app.on_event("shutdown")
+async def on_shutdown():
+    from backend.app.services.inference_pool import get_inference_pool
+    await get_inference_pool().shutdown()
+
+    from backend.app.services.cognitive_log_writer import get_cognitive_log_writer
+    await get_cognitive_log_writer().stop()
+
+    from backend.app.services.event_writer import get_event_writer
+    await get_event_writer().stop()
+
+    from backend.app.services.memory_recall import get_memory_recall
+    await get_memory_recall().stop()
+
+    from backend.app.services.ollama_client import close_ollama_client
+    await close_ollama_client()
+
+    await async_engine.dispose()
+
 # =========================
 # ROUTERS
 # =========================
@@ -57,9 +112,13 @@ app.include_router(lab_router)
 from backend.app.routes.timeline import router as timeline_router
 app.include_router(timeline_router)
 
-# (futuro)
-# from backend.app.routes.procedures import router as procedures_router
-# app.include_router(procedures_router)
+# Ingesta de procedimientos (batch)
+from backend.app.routes.procedures import router as procedures_router
+app.include_router(procedures_router)
+
+# Búsqueda de texto completo (timeline + memoria)
+from backend.app.routes.search import router as search_router
+app.include_router(search_router)
 
 # =========================
 # ROOT
@@ -74,5 +133,9 @@ def root():
             "docs": "/docs",
             "lab": "/lab",
             "timeline": "/procedures/{procedure_id}/timeline",
+            "timeline_export": "/procedures/{procedure_id}/timeline.ndjson",
+            "events_batch": "/procedures/{procedure_id}/events:batch",
+            "search": "/search?q=...&user_id=...|procedure_id=...",
+            "recall": "/search/recall?q=...&user_id=...",
         },
     }
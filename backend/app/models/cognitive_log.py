@@ -0,0 +1,48 @@
+import uuid
+import os
+from sqlalchemy import Column, DateTime, Integer, String, Index
+from sqlalchemy.sql import func
+
+from backend.app.db.base import Base
+
+# ==========================================
+# Compatibilidad LAB (SQLite) vs PROD (Postgres)
+# ==========================================
+is_sqlite = "sqlite" in os.getenv("DATABASE_URL", "") or not os.getenv("DATABASE_URL")
+
+if is_sqlite:
+    from sqlalchemy import JSON
+    JSONB = JSON
+    UUID_TYPE = String(36)
+    def uuid_gen():
+        return str(uuid.uuid4())
+else:
+    from sqlalchemy.dialects.postgresql import UUID, JSONB
+    UUID_TYPE = UUID(as_uuid=True)
+    def uuid_gen():
+        return uuid.uuid4()
+
+
+class CognitiveLog(Base):
+    """Hallazgos cognitivos por análisis del observer (histórico offline)."""
+    __tablename__ = "cognitive_logs"
+
+    id = Column(UUID_TYPE, primary_key=True, default=uuid_gen)
+
+    # Momento del análisis (no del flush del batch)
+    analyzed_at = Column(DateTime(timezone=True), nullable=False)
+    model_name = Column(String, nullable=True)
+    context_hash = Column(String(64), nullable=False)
+    response_length = Column(Integer, nullable=False)
+
+    confidence_assessment = Column(String, nullable=False)
+    uncertainty_markers = Column(JSONB, nullable=False)
+    contradiction_markers = Column(JSONB, nullable=False)
+    overgeneralization_markers = Column(JSONB, nullable=False)
+    fabrication_markers = Column(JSONB, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_cognitive_logs_analyzed_at", "analyzed_at"),
+    )
@@ -0,0 +1,37 @@
+import os
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Index
+from sqlalchemy.sql import func
+
+from backend.app.db.base import Base
+
+# ==========================================
+# Compatibilidad LAB (SQLite) vs PROD (Postgres)
+# ==========================================
+is_sqlite = "sqlite" in os.getenv("DATABASE_URL", "") or not os.getenv("DATABASE_URL")
+
+if is_sqlite:
+    UUID_TYPE = String(36)
+else:
+    from sqlalchemy.dialects.postgresql import UUID
+    UUID_TYPE = UUID(as_uuid=True)
+
+
+class MemoryEmbedding(Base):
+    """Embedding de un MemoryNode (recall semántico de memoria LIFE)."""
+    __tablename__ = "memory_embeddings"
+
+    # Un embedding por nodo y modelo (cambiar de modelo = re-embeber)
+    node_id = Column(UUID_TYPE, primary_key=True)
+    model = Column(String, primary_key=True)
+    user_id = Column(UUID_TYPE, nullable=False)
+
+    dim = Column(Integer, nullable=False)
+    # float32 little-endian, normalizado (coseno = producto punto)
+    vector = Column(LargeBinary, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Carga del store de un usuario: WHERE user_id = ? AND model = ?
+        Index("ix_memory_embeddings_user_model", "user_id", "model"),
+    )
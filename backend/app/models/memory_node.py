@@ -1,6 +1,6 @@
 import uuid
 import os
-from sqlalchemy import Column, DateTime, Text
+from sqlalchemy import Column, DateTime, Text, Index
 # from sqlalchemy.dialects.postgresql import UUID <-- Reemplazado
 from sqlalchemy.sql import func
 from sqlalchemy import String
@@ -18,7 +18,7 @@ if is_sqlite:
     def uuid_gen():
         return str(uuid.uuid4())
 else:
-    from sqlalchemy.dialects.postgresql import UUID
+    from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
     UUID_TYPE = UUID(as_uuid=True)
     def uuid_gen():
         return uuid.uuid4()
@@ -28,6 +28,18 @@ class MemoryNode(Base):
     __tablename__ = "memory_nodes"
 
     id = Column(UUID_TYPE, primary_key=True, default=uuid_gen)
-    user_id = Column(UUID_TYPE, nullable=False, index=True)
+    # Indexado por ix_memory_nodes_user_created (prefijo user_id)
+    user_id = Column(UUID_TYPE, nullable=False)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_memory_nodes_user_created", "user_id", "created_at"),
+    )
+
+    if not is_sqlite:
+        # Búsqueda de texto completo, mantenida por trigger (db/fulltext.py; en SQLite: tabla FTS5 memory_nodes_fts)
+        search_vector = Column(TSVECTOR, nullable=True)
+        __table_args__ += (
+            Index("ix_memory_nodes_search", "search_vector", postgresql_using="gin"),
+        )
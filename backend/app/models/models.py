@@ -2,3 +2,5 @@
 
 from backend.app.models.voice_event import VoiceEvent
 from backend.app.models.memory_node import MemoryNode
+from backend.app.models.cognitive_log import CognitiveLog
+from backend.app.models.memory_embedding import MemoryEmbedding
@@ -1,6 +1,6 @@
 import uuid
 import os
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime, Text, Index
 # from sqlalchemy.dialects.postgresql import UUID, JSONB  <-- Reemplazado por lógica condicional
 from sqlalchemy.sql import func
 
@@ -19,19 +19,26 @@ if is_sqlite:
     UUID_TYPE = String(36)
     def uuid_gen():
         return str(uuid.uuid4())
+    def to_db_uuid(value):
+        return str(value) if value is not None else None
 else:
-    from sqlalchemy.dialects.postgresql import UUID, JSONB
+    from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
     # En Postgres usamos UUID nativo
     UUID_TYPE = UUID(as_uuid=True)
     def uuid_gen():
         return uuid.uuid4()
+    def to_db_uuid(value):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(str(value))
 
 
 class VoiceEvent(Base):
     __tablename__ = "voice_events"
 
     id = Column(UUID_TYPE, primary_key=True, default=uuid_gen)
-    procedure_id = Column(UUID_TYPE, nullable=False, index=True)
+    # Indexado por ix_voice_events_procedure_created (prefijo procedure_id)
+    procedure_id = Column(UUID_TYPE, nullable=False)
     user_id = Column(UUID_TYPE, nullable=False)
 
     intent = Column(String, nullable=False)
@@ -43,3 +50,15 @@ class VoiceEvent(Base):
     user_role = Column(String, nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Timeline: WHERE procedure_id = ? ORDER BY created_at, id (keyset) sin sort
+        Index("ix_voice_events_procedure_created", "procedure_id", "created_at", "id"),
+    )
+
+    if not is_sqlite:
+        # Búsqueda de texto completo, mantenida por trigger (db/fulltext.py; en SQLite: tabla FTS5 voice_events_fts)
+        search_vector = Column(TSVECTOR, nullable=True)
+        __table_args__ += (
+            Index("ix_voice_events_search", "search_vector", postgresql_using="gin"),
+        )
@@ -1,21 +1,30 @@
+import json
+import os
+import time
 from uuid import UUID
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 
-from backend.app.db.session import get_db
+from backend.app.db.session import get_pool_metrics
 from backend.app.routes.procedures import handle_voice_event
 from backend.app.services.agent_context import get_user_context
 
 # ObserverAgent para análisis pasivo
 from backend.agents.observer_agent import get_observer, get_warmup_status
-from backend.app.services.llm_agent import run_llm
+from backend.app.services.cognitive_log_writer import get_cognitive_log_writer
+from backend.app.services.event_writer import get_event_writer
+from backend.app.services.llm_agent import run_llm, stream_llm
+from backend.app.services.memory_recall import get_memory_recall
 
 router = APIRouter()
 
+# /lab WORK: "enqueue" responde apenas persiste (LLM como task del pool),
+# "await" espera la respuesta del LLM dentro del request
+LAB_LLM_MODE = os.getenv("LAB_LLM_MODE", "enqueue")
+
 
 # =========================
 # Modelos de entrada LAB
@@ -26,6 +35,7 @@ class LabPayload(BaseModel):
     user_id: UUID | None = None
     role: str | None = "anonymous"
     options: dict | None = None
+    llm_mode: Literal["enqueue", "await"] | None = None  # default: LAB_LLM_MODE
 
 
 class PatientContext(BaseModel):
@@ -44,6 +54,8 @@ class ObserverRequest(BaseModel):
     """Request para el endpoint del observer."""
     patient_context: PatientContext
     force: bool = False  # Forzar análisis ignorando throttling
+    session_id: Optional[str] = None    # Throttling por sesión del clínico
+    procedure_id: Optional[str] = None  # Alternativa: throttling por procedimiento
 
 
 class AgentRequest(BaseModel):
@@ -687,6 +699,13 @@ let countdownTimer = null;
 let slowResponseTimer = null;
 const POLL_INTERVAL_MS = 15000;  // 15 segundos (más espacio para análisis largo)
 
+// Sesión del clínico: el throttling del observer es por sesión
+let OBSERVER_SESSION_ID = sessionStorage.getItem('observerSessionId');
+if (!OBSERVER_SESSION_ID) {
+  OBSERVER_SESSION_ID = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Date.now()) + Math.random();
+  sessionStorage.setItem('observerSessionId', OBSERVER_SESSION_ID);
+}
+
 function getPatientContext() {
   return {
     patient_name: document.getElementById('patientName').value || '',
@@ -914,6 +933,58 @@ function updateObserverUI(analysis) {
   content.innerHTML = html;
 }
 
+function handleObserverResult(data) {
+  // Task completada (status 'ok')
+  if (data.status === 'ok') {
+    observerLoading = false; // RELEASE LOCK
+    
+    // Verificar status interno del análisis
+    if (data.task_status === 'error') {
+       // Error de ejecución del LLM
+       const err = data.analysis.llm_error || 'Error desconocido';
+       showStatus('error', err);
+       updateObserverUI(data.analysis); // Mostrar error visual
+    } else {
+       // Éxito
+       lastAnalysis = data.analysis;
+       lastContextHash = hashContext(getPatientContext()); // Update hash
+       lastUpdateTime = new Date();
+       updateObserverUI(data.analysis);
+
+       const llmStatus = data.analysis.llm_status || 'connected';
+       if (llmStatus === 'connected' || llmStatus === 'ok') {
+          showStatus('updated', `Actualizado · ${formatTime(lastUpdateTime)}`);
+       } else if (llmStatus === 'waiting') {
+          showStatus('idle', 'Esperando contexto');
+       } else {
+          showStatus('idle', 'LLM no disponible');
+       }
+    }
+  } else {
+    showStatus('error', 'Respuesta inesperada del servidor');
+    observerLoading = false; // RELEASE LOCK
+  }
+}
+
+function subscribeObserver(taskId) {
+  // Push (SSE): el servidor emite `result` apenas termina el análisis
+  if (!window.EventSource) {
+    pollObserverStatus(taskId);
+    return;
+  }
+
+  const source = new EventSource(`/lab/observer/${taskId}/events`);
+  source.addEventListener('result', (ev) => {
+    source.close();
+    handleObserverResult(JSON.parse(ev.data));
+  });
+  source.onerror = () => {
+    // Fallback a polling si el canal push se corta
+    source.close();
+    if (observerLoading) pollObserverStatus(taskId);
+  };
+}
+
 async function pollObserverStatus(taskId) {
   try {
     const res = await fetch(`/lab/observer/${taskId}`);
@@ -931,36 +1002,7 @@ async function pollObserverStatus(taskId) {
       return;
     }
     
-    // Task completada (status 'ok')
-    if (data.status === 'ok') {
-      observerLoading = false; // RELEASE LOCK
-      
-      // Verificar status interno del análisis
-      if (data.task_status === 'error') {
-         // Error de ejecución del LLM
-         const err = data.analysis.llm_error || 'Error desconocido';
-         showStatus('error', err);
-         updateObserverUI(data.analysis); // Mostrar error visual
-      } else {
-         // Éxito
-         lastAnalysis = data.analysis;
-         lastContextHash = hashContext(getPatientContext()); // Update hash
-         lastUpdateTime = new Date();
-         updateObserverUI(data.analysis);
-
-         const llmStatus = data.analysis.llm_status || 'connected';
-         if (llmStatus === 'connected' || llmStatus === 'ok') {
-            showStatus('updated', `Actualizado · ${formatTime(lastUpdateTime)}`);
-         } else if (llmStatus === 'waiting') {
-            showStatus('idle', 'Esperando contexto');
-         } else {
-            showStatus('idle', 'LLM no disponible');
-         }
-      }
-    } else {
-      showStatus('error', 'Respuesta inesperada del servidor');
-      observerLoading = false; // RELEASE LOCK
-    }
+    handleObserverResult(data);
   } catch (err) {
     console.error(err);
     showStatus('error', 'Error de red en polling');
@@ -1012,7 +1054,7 @@ async function callObserver(force = false) {
     const res = await fetch('/lab/observer', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ patient_context: ctx, force: force }),
+      body: JSON.stringify({ patient_context: ctx, force: force, session_id: OBSERVER_SESSION_ID }),
       signal: currentController.signal
     });
 
@@ -1025,9 +1067,9 @@ async function callObserver(force = false) {
     const data = await res.json();
     const taskId = data.task_id;
     
-    // 2. Iniciar Polling
-    // Nota: observerLoading se mantiene true hasta que el polling termine
-    pollObserverStatus(taskId);
+    // 2. Esperar resultado (push SSE, fallback polling)
+    // Nota: observerLoading se mantiene true hasta recibir el resultado
+    subscribeObserver(taskId);
 
   } catch (err) {
     if (err.name === 'AbortError') {
@@ -1039,8 +1081,8 @@ async function callObserver(force = false) {
   } finally {
     currentController = null;
     // IMPORTANTE: NO poner observerLoading = false aquí, 
-    // porque el polling sigue corriendo en background (promesa separada)
-    // El polling se encarga de liberar el loading.
+    // porque la suscripción sigue activa en background (promesa separada)
+    // handleObserverResult se encarga de liberar el loading.
   }
 }
 
@@ -1075,43 +1117,12 @@ function stopPolling() {
 // AGENT ACTIVE LOGIC
 // =============================
 
-async function pollAgentStatus(taskId) {
-  try {
-    const res = await fetch(`/lab/agent/${taskId}`);
-    if (!res.ok) {
-        document.getElementById('agentStatus').innerText = "Error polling agent";
-        return;
-    }
-    
-    const data = await res.json();
-    
-    if (data.status === 'processing') {
-       setTimeout(() => pollAgentStatus(taskId), 1000);
-    } else {
-       // Done
-       document.getElementById('agentStatus').style.display = 'none';
-       document.getElementById('btnSendAgent').disabled = false;
-       
-       if (data.status === 'ok') {
-         if (data.task_status === 'error') {
-            document.getElementById('agentOutput').innerText = JSON.stringify(data.result, null, 2); 
-            document.getElementById('agentOutput').style.color = '#dc2626';
-         } else {
-            // Success
-             const result = data.result || {};
-             const answer = result.answer || JSON.stringify(result, null, 2);
-             document.getElementById('agentOutput').innerText = answer;
-             document.getElementById('agentOutput').style.color = '#334155';
-         }
-       } else {
-         document.getElementById('agentOutput').innerText = "Respuesta inválida del servidor";
-       }
-    }
-  } catch (err) {
-     console.error("Polling agent error", err);
-     document.getElementById('agentStatus').innerText = "Error de red";
-     document.getElementById('btnSendAgent').disabled = false;
-  }
+function renderAgentDone(done) {
+  const output = document.getElementById('agentOutput');
+  const status = document.getElementById('agentStatus');
+  output.innerText = done.answer || output.innerText;
+  status.style.display = 'block';
+  status.innerText = `${done.tokens || 0} tokens · ${((done.llm_ms || 0)/1000).toFixed(1)}s · primer token ${((done.ttft_ms || 0)/1000).toFixed(1)}s`;
 }
 
 async function callAgent() {
@@ -1127,13 +1138,15 @@ async function callAgent() {
   status.style.display = 'block';
   status.innerText = "Procesando...";
   output.innerText = "";
+  output.style.color = '#334155';
   
   try {
     // Get updated context
     const ctx = getPatientContext();
     const role = document.getElementById('agentRole').value;
 
-    const res = await fetch('/lab/agent', {
+    // Streaming SSE: los tokens se muestran apenas llegan
+    const res = await fetch('/lab/agent/stream', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ 
@@ -1144,20 +1157,53 @@ async function callAgent() {
       })
     });
 
-    if (!res.ok) {
+    if (!res.ok || !res.body) {
       status.innerText = `Error HTTP ${res.status}`;
       btn.disabled = false;
       return;
     }
 
-    const data = await res.json();
-    const taskId = data.task_id;
-    
-    // Start Polling
-    pollAgentStatus(taskId);
-
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Cada evento SSE termina en línea en blanco
+      let sep;
+      while ((sep = buffer.indexOf('\\n\\n')) !== -1) {
+        const raw = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+
+        let event = 'message';
+        let data = '';
+        raw.split('\\n').forEach(line => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        if (!data) continue;
+        const payload = JSON.parse(data);
+
+        if (event === 'token') {
+          status.innerText = "Generando...";
+          output.innerText += payload.token;
+        } else if (event === 'error') {
+          // Mismo mensaje que el polling: el error del servidor, no uno genérico
+          const err = payload.detail ? `${payload.error}: ${payload.detail}` : payload.error;
+          output.innerText = err || 'Error desconocido';
+          output.style.color = '#dc2626';
+          status.innerText = "Error";
+        } else if (event === 'done') {
+          renderAgentDone(payload);
+        }
+      }
+    }
   } catch (err) {
     status.innerText = "Error de conexión";
+  } finally {
     btn.disabled = false;
   }
 }
@@ -1244,7 +1290,7 @@ async function checkWarmupStatus() {
 # =========================
 
 @router.post("/lab")
-async def lab_post(request: Request, db: Session = Depends(get_db)):
+async def lab_post(request: Request):
     """
     Punto único de entrada LAB.
     Aquí se simula el contexto SGMI.
@@ -1255,14 +1301,21 @@ async def lab_post(request: Request, db: Session = Depends(get_db)):
     # -------------------------
     content_type = request.headers.get("content-type", "")
 
-    if "application/json" in content_type:
-        body = await request.json()
-        payload = LabPayload(**body)
-    else:
-        form = await request.form()
-        payload = LabPayload(
-            raw_text=form.get("raw_text", ""),
-            role=form.get("role", "anonymous"),
+    try:
+        if "application/json" in content_type:
+            body = await request.json()
+            payload = LabPayload(**body)
+        else:
+            form = await request.form()
+            payload = LabPayload(
+                raw_text=form.get("raw_text", ""),
+                role=form.get("role", "anonymous"),
+                llm_mode=form.get("llm_mode") or None,
+            )
+    except ValidationError as e:
+        return JSONResponse(
+            status_code=422,
+            content={"error": "LAB_INVALID_PAYLOAD", "detail": json.loads(e.json(include_url=False))},
         )
 
     # -------------------------
@@ -1289,8 +1342,11 @@ async def lab_post(request: Request, db: Session = Depends(get_db)):
     # -------------------------
     # Flujo principal
     # -------------------------
+    llm_mode = payload.llm_mode or LAB_LLM_MODE
+    dispatch_llm = _await_lab_llm if llm_mode == "await" else _enqueue_lab_llm
+
     try:
-        result = handle_voice_event(payload, db=db)
+        result = await handle_voice_event(payload, dispatch_llm=dispatch_llm)
     except Exception as e:
         # No caemos: devolvemos error controlado
         return JSONResponse(
@@ -1308,11 +1364,22 @@ async def lab_post(request: Request, db: Session = Depends(get_db)):
 # System Status Endpoint
 # =========================
 @router.get("/lab/status")
-def get_lab_status():
+async def get_lab_status():
     """Retorna estado del sistema (warmup, db, etc)."""
     return {
         "status": "running",
-        "warmup_done": get_warmup_status()
+        "warmup_done": get_warmup_status(),
+        "tasks": {
+            "observer": await tasks.metrics(),
+            "agent": await tasks_agent.metrics(),
+        },
+        "inference": inference_pool.metrics(),
+        "observer_cache": get_observer().get_cache_metrics(),
+        "observer_sessions": get_observer().get_session_metrics(),
+        "cognitive_log_writer": get_cognitive_log_writer().metrics(),
+        "event_writer": get_event_writer().metrics(),
+        "db_pool": get_pool_metrics(),
+        "memory_recall": get_memory_recall().metrics(),
     }
 
 
@@ -1323,50 +1390,104 @@ def get_lab_status():
 # =========================
 # Async Task Store & Models
 # =========================
-from fastapi import BackgroundTasks
 import uuid
 from datetime import datetime
 
-# Simple in-memory task store
-# Structure: { task_id: { "status": "processing"|"done"|"error", "result": ..., "error": ... } }
+from backend.app.services.task_store import TaskStore, create_task_store
+from backend.app.services.inference_pool import get_inference_pool, InferencePoolFull
+
+# Task store acotado (TTL + tamaño máximo); memoria o Redis según TASK_STORE_BACKEND
 # Structure: { task_id: { "status": "processing"|"done"|"error", "result": ..., "error": ... } }
-tasks = {}
-tasks_agent = {}
+tasks = create_task_store("observer")
+tasks_agent = create_task_store("agent")
+
+# Pool dedicado de inferencia (no comparte el threadpool de Starlette)
+inference_pool = get_inference_pool()
+
+
+def _pool_full_response() -> JSONResponse:
+    """Backpressure: el cliente debe reintentar más tarde."""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": "2"},
+        content={
+            "error": "INFERENCE_QUEUE_FULL",
+            "detail": "Pool de inferencia saturado, reintentar en unos segundos.",
+            "queue_depth": inference_pool.metrics()["queue_depth"],
+        },
+    )
 
 import asyncio
 
+# Push de resultados: task_id -> asyncio.Event (se activa al terminar la task)
+task_events = {}
+# Streams SSE abiertos por task en este worker (el último libera su Event)
+task_subscribers = {}
+SSE_HEARTBEAT_S = 15.0
+# Con store compartido la task puede terminar en otro worker: re-chequear seguido
+SSE_SHARED_RECHECK_S = 1.0
+
+
+# Handles cancelables de inferencias en vuelo (locales a este worker)
+task_handles = {}
+
+
+def track_task(task_id: str, handle: asyncio.Task):
+    """Asocia el asyncio.Task del pool a la task para poder abortarla."""
+    task_handles[task_id] = handle
+    handle.add_done_callback(lambda _: task_handles.pop(task_id, None))
+
+
+def cancel_task(task_id: str) -> bool:
+    """Aborta la inferencia en vuelo (request HTTP a Ollama incluido) y libera el slot."""
+    handle = task_handles.pop(task_id, None)
+    if handle is None or handle.done():
+        return False
+    handle.cancel()
+    return True
+
+
+def notify_task_done(task_id: str):
+    """Despierta a los suscriptores SSE de una task terminada."""
+    event = task_events.pop(task_id, None)
+    if event is not None:
+        event.set()
+
 async def supervisor_loop():
     """Calcula y limpia timeouts cada 12s."""
     print("[SUPERVISOR] Iniciando loop de monitoreo (12s)...")
     while True:
         try:
             await asyncio.sleep(12)
-            now = datetime.now()
-            
-            # Revisar Observer Tasks
-            for tid, t in tasks.items():
-                if t["status"] == "processing":
-                    started = datetime.fromisoformat(t["started_at"])
-                    if (now - started).total_seconds() > 60:
-                        tasks[tid] = {
-                            "status": "error",
-                            "error": "TIMEOUT_SUPERVISOR",
-                            "result": {"llm_error": "Timeout forzado por supervisor"}
-                        }
-                        print(f"[SUPERVISOR] Task {tid} timed out.")
+
+            # Revisar Observer Tasks (solo las en proceso más antiguas)
+            for tid in await tasks.timed_out(60):
+                applied = await tasks.finish(tid, {
+                    "status": "error",
+                    "error": "TIMEOUT_SUPERVISOR",
+                    "result": {"llm_error": "Timeout forzado por supervisor"}
+                })
+                if applied:
+                    cancel_task(tid)
+                    notify_task_done(tid)
+                    print(f"[SUPERVISOR] Task {tid} timed out.")
 
             # Revisar Agent Tasks
-            for tid, t in tasks_agent.items():
-                if t["status"] == "processing":
-                    started = datetime.fromisoformat(t["started_at"])
-                    if (now - started).total_seconds() > 60:
-                        tasks_agent[tid] = {
-                            "status": "error",
-                            "error": "TIMEOUT_SUPERVISOR",
-                            "result": {"answer": "Error: Timeout forzado por supervisor"}
-                        }
-                        print(f"[SUPERVISOR] Agent Task {tid} timed out.")
-                        
+            for tid in await tasks_agent.timed_out(60):
+                applied = await tasks_agent.finish(tid, {
+                    "status": "error",
+                    "error": "TIMEOUT_SUPERVISOR",
+                    "result": {"answer": "Error: Timeout forzado por supervisor"}
+                })
+                if applied:
+                    cancel_task(tid)
+                    notify_task_done(tid)
+                    print(f"[SUPERVISOR] Agent Task {tid} timed out.")
+
+            # Expirar tasks terminadas
+            await tasks.prune()
+            await tasks_agent.prune()
+
         except Exception as e:
             print(f"[SUPERVISOR] Error en loop: {e}")
             await asyncio.sleep(5)  # Backoff ante error interno
@@ -1375,21 +1496,22 @@ def start_supervisor():
     """Inicia el supervisor en background (sin bloquear)."""
     asyncio.create_task(supervisor_loop())
 
-def run_observer_background(task_id: str, patient_context: dict, force: bool):
+async def run_observer_background(task_id: str, patient_context: dict, force: bool, session_id: Optional[str] = None):
     """Background worker wrapper"""
     try:
         observer = get_observer()
-        result = observer.analyze(
+        result = await observer.analyze(
             patient_context=patient_context,
-            force=force
+            force=force,
+            session_id=session_id
         )
-        tasks[task_id] = {
+        await tasks.finish(task_id, {
             "status": "done",
             "result": result,
             "updated_at": datetime.now().isoformat()
-        }
+        })
     except Exception as e:
-        tasks[task_id] = {
+        await tasks.finish(task_id, {
             "status": "error",
             "result": {
                 "llm_status": "error",
@@ -1399,36 +1521,40 @@ def run_observer_background(task_id: str, patient_context: dict, force: bool):
                 "metrics": {"response_time_ms": 0, "eval_count": 0}
             },
             "error": str(e)
-        }
+        })
+    notify_task_done(task_id)
 
 @router.post("/lab/observer", status_code=202)
-async def observer_analyze(request: ObserverRequest, background_tasks: BackgroundTasks):
+async def observer_analyze(request: ObserverRequest):
     """
     Endpoint ASYNC para el ObserverAgent.
-    Retorna inmediatamente un task_id.
+    Retorna inmediatamente un task_id (429 si el pool de inferencia está saturado).
     """
+    if inference_pool.saturated:
+        return _pool_full_response()
+
     task_id = str(uuid.uuid4())
-    tasks[task_id] = {"status": "processing", "started_at": datetime.now().isoformat()}
+    await tasks.create(task_id)
 
-    background_tasks.add_task(
-        run_observer_background, 
-        task_id, 
-        request.patient_context.model_dump(), 
-        request.force
-    )
+    try:
+        handle = inference_pool.submit(
+            run_observer_background,
+            task_id,
+            request.patient_context.model_dump(),
+            request.force,
+            request.session_id or request.procedure_id
+        )
+    except InferencePoolFull:
+        await tasks.finish(task_id, {"status": "error", "error": "INFERENCE_QUEUE_FULL", "result": {}})
+        return _pool_full_response()
 
+    track_task(task_id, handle)
     return {"task_id": task_id, "status": "processing"}
 
-@router.get("/lab/observer/{task_id}")
-async def get_observer_result(task_id: str):
-    """Polling endpoint"""
-    task = tasks.get(task_id)
-    if not task:
-        return JSONResponse(status_code=404, content={"error": "Task not found"})
-    
+def _observer_payload(task: dict) -> dict:
     if task["status"] == "processing":
         return {"status": "processing"}
-    
+
     # Return result consistent with previous schema
     return {
         "status": "ok", # API status ok
@@ -1436,28 +1562,53 @@ async def get_observer_result(task_id: str):
         "analysis": task["result"]
     }
 
+@router.get("/lab/observer/cognitive")
+async def get_observer_cognitive(recent: int = Query(0, ge=0, le=100)):
+    """Resumen cognitivo agregado del observer (+ entradas recientes opcionales)."""
+    observer = get_observer()
+    payload = {"summary": observer.get_cognitive_summary()}
+    if recent:
+        payload["recent"] = observer.get_cognitive_recent(recent)
+    return payload
+
+@router.get("/lab/observer/{task_id}")
+async def get_observer_result(task_id: str):
+    """Polling endpoint (compatibilidad; preferir /events)"""
+    task = await tasks.get(task_id)
+    if not task:
+        return JSONResponse(status_code=404, content={"error": "Task not found"})
+    
+    return _observer_payload(task)
+
+@router.get("/lab/observer/{task_id}/events")
+async def observer_events(task_id: str):
+    """Push SSE: emite `result` apenas termina la task (mismo payload que el polling)."""
+    if await tasks.get(task_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Task not found"})
+    return _task_event_stream(task_id, tasks, _observer_payload)
+
 
 # =========================
 # Agent Core Endpoint (Async)
 # =========================
 
-def run_agent_background(task_id: str, user_text: str, role: str, context: dict, options: dict):
+async def run_agent_background(task_id: str, user_text: str, role: str, context: dict, options: dict):
     """Background worker para Agent Core"""
     try:
         # Llamada al núcleo cognitivo real con ROL y CONTEXTO
-        result = run_llm(
+        result = await run_llm(
             user_text=user_text,
             role=role,
             context=context,
             options=options
         )
-        tasks_agent[task_id] = {
+        await tasks_agent.finish(task_id, {
             "status": "done",
             "result": result,
             "updated_at": datetime.now().isoformat()
-        }
+        })
     except Exception as e:
-        tasks_agent[task_id] = {
+        await tasks_agent.finish(task_id, {
             "status": "error",
             "result": {
                 "answer": f"Error del agente: {str(e)}",
@@ -1465,39 +1616,187 @@ def run_agent_background(task_id: str, user_text: str, role: str, context: dict,
                 "provider": "error"
             },
             "error": str(e)
-        }
+        })
+    notify_task_done(task_id)
 
 @router.post("/lab/agent", status_code=202)
-async def agent_analyze(request: AgentRequest, background_tasks: BackgroundTasks):
+async def agent_analyze(request: AgentRequest):
     """
     Endpoint ASYNC para el Agente Activo (Core).
     """
+    if inference_pool.saturated:
+        return _pool_full_response()
+
     task_id = str(uuid.uuid4())
-    tasks_agent[task_id] = {"status": "processing", "started_at": datetime.now().isoformat()}
-
-    background_tasks.add_task(
-        run_agent_background, 
-        task_id, 
-        request.user_text, 
-        request.role,
-        request.patient_context,
-        request.options or {}
-    )
+    await tasks_agent.create(task_id)
 
+    try:
+        handle = inference_pool.submit(
+            run_agent_background,
+            task_id,
+            request.user_text,
+            request.role,
+            request.patient_context,
+            request.options or {}
+        )
+    except InferencePoolFull:
+        await tasks_agent.finish(task_id, {"status": "error", "error": "INFERENCE_QUEUE_FULL", "result": {}})
+        return _pool_full_response()
+
+    track_task(task_id, handle)
     return {"task_id": task_id, "status": "processing"}
 
-@router.get("/lab/agent/{task_id}")
-async def get_agent_result(task_id: str):
-    """Polling endpoint para Agent"""
-    task = tasks_agent.get(task_id)
-    if not task:
-        return JSONResponse(status_code=404, content={"error": "Task not found"})
-    
+async def _enqueue_lab_llm(llm_kwargs: dict) -> dict:
+    """/lab WORK: el LLM corre como task del agente; se retorna su id."""
+    if inference_pool.saturated:
+        return {"response": None, "llm_error": "INFERENCE_QUEUE_FULL"}
+
+    task_id = str(uuid.uuid4())
+    await tasks_agent.create(task_id)
+    try:
+        handle = inference_pool.submit(
+            run_agent_background,
+            task_id,
+            llm_kwargs["user_text"],
+            llm_kwargs["role"],
+            llm_kwargs.get("context", {}),
+            {},
+        )
+    except InferencePoolFull:
+        await tasks_agent.finish(task_id, {"status": "error", "error": "INFERENCE_QUEUE_FULL", "result": {}})
+        return {"response": None, "llm_error": "INFERENCE_QUEUE_FULL"}
+
+    track_task(task_id, handle)
+    return {
+        "response": None,
+        "llm_task": {
+            "task_id": task_id,
+            "status": "processing",
+            "poll": f"/lab/agent/{task_id}",
+            "events": f"/lab/agent/{task_id}/events",
+        },
+    }
+
+
+async def _await_lab_llm(llm_kwargs: dict) -> dict:
+    """/lab WORK en modo await: respuesta inline, con el mismo límite del pool."""
+    try:
+        async with inference_pool.slot():
+            return {"response": await run_llm(**llm_kwargs)}
+    except InferencePoolFull:
+        # El evento ya está persistido: no se responde 429 para evitar reintentos duplicados
+        return {"response": None, "llm_error": "INFERENCE_QUEUE_FULL"}
+
+
+def _agent_payload(task: dict) -> dict:
     if task["status"] == "processing":
         return {"status": "processing"}
-    
+
     return {
         "status": "ok",
         "task_status": task["status"],
         "result": task["result"]
     }
+
+@router.get("/lab/agent/{task_id}")
+async def get_agent_result(task_id: str):
+    """Polling endpoint para Agent (compatibilidad; preferir /events)"""
+    task = await tasks_agent.get(task_id)
+    if not task:
+        return JSONResponse(status_code=404, content={"error": "Task not found"})
+    
+    return _agent_payload(task)
+
+@router.get("/lab/agent/{task_id}/events")
+async def agent_events(task_id: str):
+    """Push SSE del resultado del Agent Core."""
+    if await tasks_agent.get(task_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Task not found"})
+    return _task_event_stream(task_id, tasks_agent, _agent_payload)
+
+
+# =========================
+# Agent Core Streaming (SSE)
+# =========================
+
+def _sse(event: str, data: dict) -> str:
+    """Formatea un evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _task_event_stream(task_id: str, store: TaskStore, render) -> StreamingResponse:
+    """
+    SSE de una sola entrega: espera a que la task salga de `processing`
+    y emite `result`. Mientras tanto envía heartbeats (comentarios SSE).
+    """
+
+    async def event_source():
+        wait_s = SSE_SHARED_RECHECK_S if store.shared else SSE_HEARTBEAT_S
+        last_ping = time.monotonic()
+        task_subscribers[task_id] = task_subscribers.get(task_id, 0) + 1
+        try:
+            while True:
+                task = await store.get(task_id)
+                if task is None:
+                    yield _sse("error", {"error": "Task not found"})
+                    return
+                if task["status"] != "processing":
+                    yield _sse("result", render(task))
+                    return
+                # Sin await entre el chequeo y el registro: no hay carrera con notify
+                event = task_events.setdefault(task_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=wait_s)
+                except asyncio.TimeoutError:
+                    if time.monotonic() - last_ping >= SSE_HEARTBEAT_S:
+                        last_ping = time.monotonic()
+                        yield ": ping\n\n"
+        finally:
+            # Con store compartido la task puede terminar en otro worker y
+            # notify_task_done nunca corre aquí: el último stream limpia
+            remaining = task_subscribers.get(task_id, 1) - 1
+            if remaining > 0:
+                task_subscribers[task_id] = remaining
+            else:
+                task_subscribers.pop(task_id, None)
+                task_events.pop(task_id, None)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/lab/agent/stream")
+async def agent_stream(request: AgentRequest):
+    """
+    Agente Activo en modo streaming.
+    Reenvía los chunks NDJSON de Ollama como SSE:
+    - event: token  → {"token": "..."}
+    - event: error  → {"error": "..."}
+    - event: done   → {"answer", "tokens", "provider", "llm_ms", "ttft_ms"}
+    """
+
+    if inference_pool.saturated:
+        return _pool_full_response()
+
+    async def event_source():
+        try:
+            async with inference_pool.slot():
+                async for chunk in stream_llm(
+                    user_text=request.user_text,
+                    role=request.role,
+                    context=request.patient_context,
+                    options=request.options or {},
+                ):
+                    event = chunk.pop("type")
+                    yield _sse(event, chunk)
+        except InferencePoolFull as e:
+            yield _sse("error", {"error": "INFERENCE_QUEUE_FULL", "detail": str(e)})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
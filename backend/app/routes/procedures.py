@@ -1,52 +1,134 @@
+import os
+import time
 from uuid import UUID, uuid4
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.app.models.voice_event import VoiceEvent
-from backend.app.models.memory_node import MemoryNode
+from backend.app.db.session import get_async_db
+
+from backend.app.models.voice_event import VoiceEvent, to_db_uuid, uuid_gen
+from backend.app.models.memory_node import MemoryNode, uuid_gen as memory_uuid_gen
+from backend.app.services.event_writer import EventWriter, get_event_writer
+from backend.app.services.memory_recall import get_memory_recall
 
 from backend.app.services.kai_engine import process_kai_activation
-from backend.app.services.agent_context import build_layer1_context
+from backend.app.services.agent_context import build_layer1_context, get_user_context
 from backend.app.services.llm_agent import run_llm
 
 
-def handle_voice_event(payload, db: Session) -> dict:
+# Agente KAI → rol del system prompt de run_llm
+AGENT_LLM_ROLES = {
+    "medical": "clinical",
+    "life": "personal",
+    "auditor": "administrative",
+    "support": "support",
+    "commercial": "commercial",
+}
+
+# Recibe los kwargs de run_llm y retorna los campos LLM de la respuesta
+# ({"response": ...} o {"response": None, "llm_task": {...}})
+LLMDispatch = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+# Máximo de dictados por POST /procedures/{id}/events:batch
+EVENT_BATCH_MAX = int(os.getenv("EVENT_BATCH_MAX", "1000"))
+
+router = APIRouter(prefix="/procedures", tags=["Procedures"])
+
+
+async def _await_llm(llm_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return {"response": await run_llm(**llm_kwargs)}
+
+
+def build_memory_row(user_id, content: str) -> Dict[str, Any]:
+    """Fila de memory_nodes con id generado en cliente (sin refresh)."""
+    return {
+        "id": memory_uuid_gen(),
+        "user_id": to_db_uuid(user_id),
+        "content": content,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def build_event_row(
+    procedure_id, user_id, raw_text: str, user_role: str, created_at: Optional[datetime] = None
+) -> Dict[str, Any]:
     """
-    Handler central de eventos (voz / texto).
+    Fila de voice_events con id generado en cliente.
+    created_at se fija al recibir el dictado: dentro de un batch se conserva
+    el orden de llegada (el default del servidor sería igual para todo el batch).
     """
+    return {
+        "id": uuid_gen(),
+        "procedure_id": to_db_uuid(procedure_id),
+        "user_id": to_db_uuid(user_id),
+        "intent": "CLINICAL_NOTE",
+        "confidence": "LAB",
+        "raw_text": raw_text,
+        "feedback": {},
+        "source": "lab",
+        "user_role": user_role,
+        "created_at": created_at or datetime.now(timezone.utc),
+    }
 
-    # -------------------------
-    # 1. KAI
-    # -------------------------
+
+def classify_voice_event(raw_text: str, user_context: dict) -> Dict[str, Any]:
+    """
+    Pipeline KAI + capa 1 (sin I/O): agente, texto limpio y modo LIFE/WORK.
+    Compartido por /lab (un dictado) y events:batch (muchos).
+    """
     kai = process_kai_activation(
-        user_text=payload.raw_text,
-        user_context=payload.options or {},
+        user_text=raw_text,
+        user_context=user_context,
     )
-
     agent = kai.get("agent")
-    kai_called = kai.get("kai_called", False)
-    clean_text = kai.get("clean_text", payload.raw_text)
-    warning = kai.get("warning")
+    layer1 = build_layer1_context(agent)
+    return {
+        "agent": agent,
+        "kai_called": kai.get("kai_called", False),
+        "clean_text": kai.get("clean_text", raw_text),
+        "warning": kai.get("warning"),
+        "layer1": layer1,
+        "mode": layer1.get("mode", "WORK"),
+    }
+
+
+async def handle_voice_event(
+    payload,
+    dispatch_llm: Optional[LLMDispatch] = None,
+    writer: Optional[EventWriter] = None,
+) -> dict:
+    """
+    Handler central de eventos (voz / texto).
+    WORK: primero persiste el evento, luego delega el LLM en dispatch_llm
+    (por defecto await directo; /lab puede encolarlo y retornar el task_id).
+    Las escrituras pasan por el writer en batch (ack según EVENT_WRITE_ACK).
+    """
+    writer = writer or get_event_writer()
 
     # -------------------------
-    # 2. Capa 1 cognitiva
+    # 1-2. KAI + capa 1 cognitiva
     # -------------------------
-    layer1 = build_layer1_context(agent)
-    mode = layer1.get("mode", "WORK")
+    kai = classify_voice_event(payload.raw_text, payload.options or {})
+
+    agent = kai["agent"]
+    kai_called = kai["kai_called"]
+    clean_text = kai["clean_text"]
+    warning = kai["warning"]
+    mode = kai["mode"]
 
     # -------------------------
     # 3. LIFE → memoria personal
     # -------------------------
     if mode == "LIFE":
-        node = MemoryNode(
-            user_id=payload.user_id,
-            content=clean_text,
-            created_at=datetime.utcnow(),
-        )
-        db.add(node)
-        db.commit()
+        node = build_memory_row(payload.user_id, clean_text)
+        await writer.write(MemoryNode, node)
+        # Embedding en background para el recall semántico
+        get_memory_recall().enqueue(node["id"], payload.user_id, clean_text)
 
         return {
             "mode": "LIFE",
@@ -68,28 +150,21 @@ def handle_voice_event(payload, db: Session) -> dict:
 
     procedure_uuid = UUID(procedure_id)
 
-    event = VoiceEvent(
-        procedure_id=procedure_uuid,
-        user_id=payload.user_id,
-        intent="CLINICAL_NOTE",
-        confidence="LAB",
-        raw_text=clean_text,
-        feedback={},
-        source="lab",
-        user_role=payload.role or "anonymous",
+    event = build_event_row(
+        procedure_uuid, payload.user_id, clean_text, payload.role or "anonymous"
     )
-    db.add(event)
-    db.commit()
-    db.refresh(event)
+    await writer.write(VoiceEvent, event)
 
     # -------------------------
     # 5. LLM (solo WORK)
     # -------------------------
-    llm_response = run_llm(
-        text=clean_text,
-        agent=agent,
-        layer1_context=layer1,
-    )
+    # Sin "context": el dictado de /lab no trae contexto de paciente, y layer1
+    # (modo / agente) no tiene campos que _build_system_prompt use
+    llm_kwargs = {
+        "user_text": clean_text,
+        "role": AGENT_LLM_ROLES.get(agent, "clinical"),
+    }
+    llm_fields = await (dispatch_llm or _await_llm)(llm_kwargs)
 
     return {
         "mode": "WORK",
@@ -97,7 +172,115 @@ def handle_voice_event(payload, db: Session) -> dict:
         "kai_called": kai_called,
         "warning": warning,
         "procedure_id": str(procedure_uuid),
-        "timeline_event_id": str(event.id),
+        "timeline_event_id": str(event["id"]),
+        "write_ack": writer.ack,
         "input": clean_text,
-        "response": llm_response,
+        **llm_fields,
+    }
+
+
+# =========================
+# INGESTA EN BATCH (replay offline)
+# =========================
+
+class EventBatchItem(BaseModel):
+    raw_text: str
+    # Referencia del cliente STT para correlacionar resultados
+    client_ref: Optional[str] = None
+    # Momento de captura del dictado (si falta: orden de llegada)
+    recorded_at: Optional[datetime] = None
+
+
+class EventBatchRequest(BaseModel):
+    user_id: UUID
+    role: str = "anonymous"
+    events: List[EventBatchItem] = Field(..., min_length=1, max_length=EVENT_BATCH_MAX)
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@router.post("/{procedure_id}/events:batch")
+async def ingest_event_batch(
+    procedure_id: UUID,
+    body: EventBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Replay de dictados acumulados por clientes STT tras un corte de red.
+    - Una pasada del pipeline KAI/modo sobre todos los ítems
+      (contexto SGMI resuelto una vez por request)
+    - WORK → voice_events del procedimiento; LIFE → memory_nodes del usuario
+    - Un INSERT multi-fila por tabla en una sola transacción (todo o nada),
+      sin pasar por la cola del EventWriter
+    - Sin LLM: el replay solo persiste; resultados por ítem en el mismo orden
+    """
+    t0 = time.perf_counter()
+    user_context = get_user_context(body.role)
+    # Sin recorded_at: created_at crece 1 µs por ítem para conservar el orden del batch
+    received_at = datetime.now(timezone.utc)
+
+    event_rows: List[Dict[str, Any]] = []
+    memory_rows: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+
+    for index, item in enumerate(body.events):
+        kai = classify_voice_event(item.raw_text, user_context)
+        result = {
+            "index": index,
+            "client_ref": item.client_ref,
+            "mode": kai["mode"],
+            "agent": kai["agent"],
+            "kai_called": kai["kai_called"],
+            "warning": kai["warning"],
+        }
+        results.append(result)
+
+        if not kai["clean_text"]:
+            result.update(status="rejected", error="EMPTY_TEXT")
+            continue
+
+        created_at = (
+            _utc(item.recorded_at) if item.recorded_at
+            else received_at + timedelta(microseconds=index)
+        )
+        if kai["mode"] == "LIFE":
+            row = build_memory_row(body.user_id, kai["clean_text"])
+            row["created_at"] = created_at
+            memory_rows.append(row)
+            result.update(status="stored", memory_node_id=str(row["id"]))
+        else:
+            row = build_event_row(
+                procedure_id, body.user_id, kai["clean_text"], body.role, created_at=created_at
+            )
+            event_rows.append(row)
+            result.update(status="stored", timeline_event_id=str(row["id"]))
+
+    try:
+        if event_rows:
+            await db.execute(insert(VoiceEvent), event_rows)
+        if memory_rows:
+            await db.execute(insert(MemoryNode), memory_rows)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Batch insert failed: {e}")
+
+    recall = get_memory_recall()
+    for row in memory_rows:
+        recall.enqueue(row["id"], body.user_id, row["content"])
+
+    stored = len(event_rows) + len(memory_rows)
+    return {
+        "procedure_id": str(procedure_id),
+        "received": len(body.events),
+        "stored": stored,
+        "rejected": len(body.events) - stored,
+        "timeline_events": len(event_rows),
+        "memory_nodes": len(memory_rows),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "results": results,
     }
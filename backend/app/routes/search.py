@@ -0,0 +1,244 @@
+import os
+import re
+from datetime import datetime
+from typing import List, Literal, Optional
+from uuid import UUID
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, literal, literal_column, select, text, union_all
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db.fulltext import SEARCH_TS_CONFIG, fts_table
+from backend.app.db.session import get_async_db
+from backend.app.models.memory_node import MemoryNode
+from backend.app.models.voice_event import VoiceEvent, is_sqlite, to_db_uuid
+from backend.app.services.memory_recall import RecallUnavailable, get_memory_recall
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+SEARCH_PAGE_DEFAULT = int(os.getenv("SEARCH_PAGE_DEFAULT", "20"))
+SEARCH_PAGE_MAX = int(os.getenv("SEARCH_PAGE_MAX", "100"))
+# Paginación por offset sobre resultados rankeados: se acota la profundidad
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET", "1000"))
+RECALL_TOP_K_MAX = int(os.getenv("RECALL_TOP_K_MAX", "100"))
+
+SearchSource = Literal["all", "timeline", "memory"]
+
+# Palabras del texto buscado (FTS5 recibe cada una entre comillas: sin operadores)
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# =========================
+# HELPERS (SQLite FTS5 vs Postgres tsvector)
+# =========================
+
+def _fts5_query(q: str) -> str:
+    """Todas las palabras deben aparecer (AND), como websearch_to_tsquery."""
+    return " ".join(f'"{term}"' for term in _TERM_RE.findall(q))
+
+
+def _as_datetime(value):
+    # text() en SQLite retorna created_at como string
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+# regconfig explícito: un parámetro sin tipo vuelve ambiguas las sobrecargas
+_TS_CONFIG = literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig")
+_HEADLINE_OPTS = "MaxWords=24, MinWords=8, StartSel=[, StopSel=]"
+
+
+def _postgres_query(q, sources, user_id, procedure_id, limit, offset):
+    """
+    Ranking sobre el índice GIN en un subquery paginado; ts_headline
+    (caro: re-parsea el texto) se calcula solo para las filas de la página.
+    """
+    ts_query = func.websearch_to_tsquery(_TS_CONFIG, q)
+    selects = []
+
+    if "timeline" in sources:
+        stmt = select(
+            literal("timeline").label("source"),
+            VoiceEvent.id,
+            VoiceEvent.procedure_id,
+            VoiceEvent.created_at,
+            func.ts_rank_cd(VoiceEvent.search_vector, ts_query).label("score"),
+            VoiceEvent.raw_text.label("body"),
+        ).where(VoiceEvent.search_vector.op("@@")(ts_query))
+        if user_id is not None:
+            stmt = stmt.where(VoiceEvent.user_id == to_db_uuid(user_id))
+        if procedure_id is not None:
+            stmt = stmt.where(VoiceEvent.procedure_id == to_db_uuid(procedure_id))
+        selects.append(stmt)
+
+    if "memory" in sources:
+        selects.append(
+            select(
+                literal("memory").label("source"),
+                MemoryNode.id,
+                literal(None, VoiceEvent.procedure_id.type).label("procedure_id"),
+                MemoryNode.created_at,
+                func.ts_rank_cd(MemoryNode.search_vector, ts_query).label("score"),
+                MemoryNode.content.label("body"),
+            )
+            .where(MemoryNode.search_vector.op("@@")(ts_query))
+            .where(MemoryNode.user_id == to_db_uuid(user_id))
+        )
+
+    hits = union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery()
+    order = (hits.c.score.desc(), hits.c.created_at.desc(), hits.c.id)
+    page = select(hits).order_by(*order).limit(limit).offset(offset).subquery()
+    return select(
+        page.c.source,
+        page.c.id,
+        page.c.procedure_id,
+        page.c.created_at,
+        page.c.score,
+        func.ts_headline(_TS_CONFIG, page.c.body, ts_query, _HEADLINE_OPTS).label("snippet"),
+    ).order_by(page.c.score.desc(), page.c.created_at.desc(), page.c.id)
+
+
+def _sqlite_query(sources, user_id, procedure_id):
+    """FTS5: bm25() es menor = mejor; se invierte para ordenar igual que ts_rank."""
+    parts = []
+    params = {}
+
+    if "timeline" in sources:
+        fts = fts_table("voice_events")
+        where = [f"{fts} MATCH :q"]
+        if user_id is not None:
+            where.append("v.user_id = :user_id")
+        if procedure_id is not None:
+            where.append("v.procedure_id = :procedure_id")
+        parts.append(
+            f"SELECT 'timeline' AS source, v.id AS id, v.procedure_id AS procedure_id, "
+            f"v.created_at AS created_at, -bm25({fts}) AS score, "
+            f"snippet({fts}, 0, '[', ']', '…', 24) AS snippet "
+            f"FROM {fts} JOIN voice_events v ON v.rowid = {fts}.rowid "
+            f"WHERE {' AND '.join(where)}"
+        )
+
+    if "memory" in sources:
+        fts = fts_table("memory_nodes")
+        parts.append(
+            f"SELECT 'memory' AS source, m.id AS id, NULL AS procedure_id, "
+            f"m.created_at AS created_at, -bm25({fts}) AS score, "
+            f"snippet({fts}, 0, '[', ']', '…', 24) AS snippet "
+            f"FROM {fts} JOIN memory_nodes m ON m.rowid = {fts}.rowid "
+            f"WHERE {fts} MATCH :q AND m.user_id = :user_id"
+        )
+
+    if user_id is not None:
+        params["user_id"] = to_db_uuid(user_id)
+    if procedure_id is not None:
+        params["procedure_id"] = to_db_uuid(procedure_id)
+    return parts, params
+
+
+# =========================
+# SEARCH ENDPOINT
+# =========================
+
+@router.get("")
+async def search(
+    q: str = Query(..., min_length=1, max_length=500),
+    user_id: Optional[UUID] = None,
+    procedure_id: Optional[UUID] = None,
+    source: SearchSource = "all",
+    limit: int = Query(SEARCH_PAGE_DEFAULT, ge=1, le=SEARCH_PAGE_MAX),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Búsqueda de texto completo en timeline (raw_text) y memoria (content).
+    - Scope obligatorio: user_id y/o procedure_id
+    - procedure_id solo aplica al timeline (la memoria es por usuario)
+    - Orden por relevancia, luego más reciente primero
+    """
+    if user_id is None and procedure_id is None:
+        raise HTTPException(status_code=400, detail="user_id or procedure_id is required")
+
+    sources: List[str] = ["timeline", "memory"] if source == "all" else [source]
+    if procedure_id is not None or user_id is None:
+        sources = [s for s in sources if s != "memory"]
+    if not sources:
+        raise HTTPException(status_code=400, detail="memory search requires user_id without procedure_id")
+
+    if is_sqlite:
+        fts_q = _fts5_query(q)
+        if not fts_q:
+            raise HTTPException(status_code=400, detail="Query has no searchable terms")
+        parts, params = _sqlite_query(sources, user_id, procedure_id)
+        statement = text(
+            " UNION ALL ".join(parts)
+            + " ORDER BY score DESC, created_at DESC, id LIMIT :limit OFFSET :offset"
+        )
+        params.update(q=fts_q, limit=limit + 1, offset=offset)
+        try:
+            rows = (await db.execute(statement, params)).all()
+        except OperationalError as e:
+            # Tablas FTS5 aún no creadas (ensure_indexes) o SQLite sin FTS5
+            raise HTTPException(status_code=503, detail=f"Full-text search unavailable: {e.orig}")
+    else:
+        statement = _postgres_query(q, sources, user_id, procedure_id, limit + 1, offset)
+        rows = (await db.execute(statement)).all()
+
+    has_more = len(rows) > limit and offset + limit <= SEARCH_MAX_OFFSET
+    rows = rows[:limit]
+
+    return {
+        "query": q,
+        "scope": {
+            "user_id": str(user_id) if user_id else None,
+            "procedure_id": str(procedure_id) if procedure_id else None,
+            "sources": sources,
+        },
+        "count": len(rows),
+        "offset": offset,
+        "has_more": has_more,
+        "next_offset": offset + limit if has_more else None,
+        "hits": [
+            {
+                "source": row.source,
+                "id": str(row.id),
+                "procedure_id": str(row.procedure_id) if row.procedure_id else None,
+                "created_at": _as_datetime(row.created_at).isoformat(),
+                "score": round(float(row.score), 6),
+                "snippet": row.snippet,
+            }
+            for row in rows
+        ],
+    }
+
+
+# =========================
+# RECALL SEMÁNTICO (memoria LIFE)
+# =========================
+
+@router.get("/recall")
+async def recall_memory(
+    user_id: UUID,
+    q: str = Query(..., min_length=1, max_length=2000),
+    k: int = Query(10, ge=1, le=RECALL_TOP_K_MAX),
+):
+    """
+    Top-k memorias personales por similitud semántica (embeddings).
+    Los nodos recién guardados aparecen cuando termina su embedding (async).
+    """
+    try:
+        result = await get_memory_recall().recall(user_id, q, k)
+    except RecallUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Semantic recall unavailable: {e}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Embeddings unavailable: {e}")
+
+    return {
+        "user_id": str(user_id),
+        "query": q,
+        "k": k,
+        "count": len(result["hits"]),
+        **result,
+    }
@@ -1,23 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import String, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from backend.app.db.session import SessionLocal
-from backend.app.models.voice_event import VoiceEvent
+from backend.app.db.session import AsyncSessionLocal, get_async_db
+from backend.app.models.voice_event import VoiceEvent, is_sqlite, to_db_uuid
 
 router = APIRouter(prefix="/procedures", tags=["Timeline"])
 
+TIMELINE_PAGE_DEFAULT = int(os.getenv("TIMELINE_PAGE_DEFAULT", "100"))
+TIMELINE_PAGE_MAX = int(os.getenv("TIMELINE_PAGE_MAX", "500"))
+
+# Campos proyectables (fields=...). id y created_at van siempre: forman el cursor
+TIMELINE_FIELDS = ("intent", "confidence", "raw_text", "feedback", "source", "user_role")
+
+# Export NDJSON: filas por fetch del cursor de servidor / máximo de procedimientos por export
+TIMELINE_EXPORT_BATCH = int(os.getenv("TIMELINE_EXPORT_BATCH", "500"))
+TIMELINE_EXPORT_MAX_PROCEDURES = int(os.getenv("TIMELINE_EXPORT_MAX_PROCEDURES", "1000"))
+
 
 # =========================
-# DB DEPENDENCY
+# HELPERS (SQLite LAB vs Postgres)
 # =========================
 
-def get_db():
-    db = SessionLocal()
+def _db_uuid(value: UUID):
+    """En SQLite los UUID se guardan como String(36)."""
+    return to_db_uuid(value)
+
+
+def _db_datetime(value: datetime):
+    """
+    Bind de created_at comparable con lo almacenado.
+    SQLite guarda texto: server_default (CURRENT_TIMESTAMP, UTC) sin
+    microsegundos; se compara en ese mismo formato para que el keyset
+    no salte eventos del mismo segundo.
+    """
+    if not is_sqlite:
+        return value
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    text = value.strftime("%Y-%m-%d %H:%M:%S")
+    if value.microsecond:
+        text += f".{value.microsecond:06d}"
+    return literal(text, String)
+
+
+def _encode_cursor(created_at: datetime, event_id) -> str:
+    raw = json.dumps([created_at.isoformat(), str(event_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
     try:
-        yield db
-    finally:
-        db.close()
+        created_at, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), UUID(event_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_fields(fields: Optional[str]):
+    if not fields:
+        return list(TIMELINE_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in TIMELINE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(TIMELINE_FIELDS)})",
+        )
+    return requested
+
+
+def _serialize_event(row, fields) -> dict:
+    item = {"id": str(row.id)}
+    for name in fields:
+        item[name] = getattr(row, name)
+    item["created_at"] = row.created_at.isoformat()
+    return item
 
 
 # =========================
@@ -25,18 +93,42 @@ def get_db():
 # =========================
 
 @router.get("/{procedure_id}/timeline")
-def get_procedure_timeline(
+async def get_procedure_timeline(
     procedure_id: UUID,
-    db: Session = Depends(get_db),
+    limit: int = Query(TIMELINE_PAGE_DEFAULT, ge=1, le=TIMELINE_PAGE_MAX),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    events = (
-        db.query(VoiceEvent)
-        .filter(VoiceEvent.procedure_id == procedure_id)
-        .order_by(VoiceEvent.created_at.asc())
-        .all()
-    )
+    """
+    Timeline paginado por keyset sobre (created_at, id).
+    - cursor: next_cursor de la página anterior
+    - since: solo eventos posteriores a este instante
+    - fields: proyección de columnas (p.ej. fields=intent,source)
+    """
+    selected = _parse_fields(fields)
+    columns = [VoiceEvent.id, VoiceEvent.created_at] + [
+        getattr(VoiceEvent, name) for name in selected
+    ]
 
-    if not events:
+    query = select(*columns).where(VoiceEvent.procedure_id == _db_uuid(procedure_id))
+    if since is not None:
+        query = query.where(VoiceEvent.created_at > _db_datetime(since))
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.where(
+            tuple_(VoiceEvent.created_at, VoiceEvent.id)
+            > tuple_(_db_datetime(cursor_created_at), _db_uuid(cursor_id))
+        )
+    query = query.order_by(VoiceEvent.created_at.asc(), VoiceEvent.id.asc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Primera página vacía = el procedimiento no tiene eventos
+    if not rows and not cursor and since is None:
         raise HTTPException(
             status_code=404,
             detail="No timeline events found for this procedure"
@@ -44,18 +136,92 @@ def get_procedure_timeline(
 
     return {
         "procedure_id": str(procedure_id),
-        "count": len(events),
-        "timeline": [
-            {
-                "id": str(e.id),
-                "intent": e.intent,
-                "confidence": e.confidence,
-                "raw_text": e.raw_text,
-                "feedback": e.feedback,
-                "source": e.source,
-                "user_role": e.user_role,
-                "created_at": e.created_at.isoformat(),
-            }
-            for e in events
-        ],
+        "count": len(rows),
+        "has_more": has_more,
+        "next_cursor": _encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+        "timeline": [_serialize_event(row, selected) for row in rows],
     }
+
+
+# =========================
+# EXPORT NDJSON (streaming)
+# =========================
+
+class TimelineExportRequest(BaseModel):
+    procedure_ids: List[UUID] = Field(..., min_length=1, max_length=TIMELINE_EXPORT_MAX_PROCEDURES)
+    since: Optional[datetime] = None
+    fields: Optional[str] = None
+
+
+async def _export_lines(query, selected, with_procedure: bool) -> AsyncIterator[str]:
+    """
+    Itera el resultado con cursor de servidor (stream + yield_per):
+    en memoria solo hay un batch a la vez, sin importar el tamaño del export.
+    La sesión es propia del generador: la de Depends se cierra antes de
+    que termine el streaming.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=TIMELINE_EXPORT_BATCH))
+        async for partition in result.partitions():
+            lines = []
+            for row in partition:
+                item = _serialize_event(row, selected)
+                if with_procedure:
+                    item = {"procedure_id": str(row.procedure_id), **item}
+                lines.append(json.dumps(item, ensure_ascii=False, default=str))
+            yield "\n".join(lines) + "\n"
+
+
+def _export_query(procedure_ids: List[UUID], since: Optional[datetime], selected):
+    columns = [VoiceEvent.procedure_id, VoiceEvent.id, VoiceEvent.created_at] + [
+        getattr(VoiceEvent, name) for name in selected
+    ]
+    query = select(*columns).where(
+        VoiceEvent.procedure_id.in_([_db_uuid(p) for p in procedure_ids])
+    )
+    if since is not None:
+        query = query.where(VoiceEvent.created_at > _db_datetime(since))
+    # Mismo orden que el índice (procedure_id, created_at, id): sin sort
+    return query.order_by(
+        VoiceEvent.procedure_id.asc(), VoiceEvent.created_at.asc(), VoiceEvent.id.asc()
+    )
+
+
+@router.get("/{procedure_id}/timeline.ndjson")
+async def export_procedure_timeline(
+    procedure_id: UUID,
+    since: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Timeline completo como NDJSON (un evento por línea), en streaming."""
+    selected = _parse_fields(fields)
+
+    exists = (await db.execute(
+        select(VoiceEvent.id).where(VoiceEvent.procedure_id == _db_uuid(procedure_id)).limit(1)
+    )).first()
+    if exists is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No timeline events found for this procedure"
+        )
+
+    return StreamingResponse(
+        _export_lines(_export_query([procedure_id], since, selected), selected, with_procedure=False),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/timeline.ndjson")
+async def export_timelines_bulk(body: TimelineExportRequest):
+    """
+    Export masivo (jobs nocturnos): varios procedimientos en un solo stream,
+    ordenados por procedimiento y luego por (created_at, id).
+    Cada línea incluye procedure_id.
+    """
+    selected = _parse_fields(body.fields)
+    procedure_ids = list(dict.fromkeys(body.procedure_ids))
+    return StreamingResponse(
+        _export_lines(_export_query(procedure_ids, body.since, selected), selected, with_procedure=True),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,200 @@
+"""
+cognitive_log_writer.py
+
+Persistencia durable y en batch de los hallazgos del CognitiveLogger.
+
+- enqueue() es síncrono y O(1): el observer nunca espera a la BD
+- Un loop en background hace flush por tamaño (COGNITIVE_LOG_BATCH_SIZE)
+  o por tiempo (COGNITIVE_LOG_FLUSH_S), con un solo INSERT multi-fila
+- El INSERT usa la sesión async: no bloquea el event loop
+- Buffer acotado (COGNITIVE_LOG_MAX_BUFFER): si la BD no responde se
+  descartan las entradas más antiguas en vez de crecer sin límite
+- Un batch que falla se reintenta en el siguiente flush (hasta
+  COGNITIVE_LOG_MAX_RETRIES veces) y luego se descarta
+- En shutdown se drena lo pendiente
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from backend.app.db.session import AsyncSessionLocal
+from backend.app.models.cognitive_log import CognitiveLog, is_sqlite
+
+COGNITIVE_LOG_PERSIST = os.getenv("COGNITIVE_LOG_PERSIST", "1") not in ("0", "false", "False")
+COGNITIVE_LOG_BATCH_SIZE = int(os.getenv("COGNITIVE_LOG_BATCH_SIZE", "50"))
+COGNITIVE_LOG_FLUSH_S = float(os.getenv("COGNITIVE_LOG_FLUSH_S", "5"))
+COGNITIVE_LOG_MAX_BUFFER = int(os.getenv("COGNITIVE_LOG_MAX_BUFFER", "5000"))
+COGNITIVE_LOG_MAX_RETRIES = int(os.getenv("COGNITIVE_LOG_MAX_RETRIES", "3"))
+
+_MARKER_FIELDS = (
+    "uncertainty_markers",
+    "contradiction_markers",
+    "overgeneralization_markers",
+    "fabrication_markers",
+)
+
+
+def _to_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada del CognitiveLogger → fila de cognitive_logs."""
+    try:
+        # El logger emite hora local naive: astimezone() la interpreta como local
+        analyzed_at = datetime.fromisoformat(entry["timestamp"]).astimezone(timezone.utc)
+    except (KeyError, TypeError, ValueError):
+        analyzed_at = datetime.now(timezone.utc)
+    return {
+        # ID generado en cliente: el INSERT multi-fila no necesita RETURNING
+        "id": str(uuid.uuid4()) if is_sqlite else uuid.uuid4(),
+        "analyzed_at": analyzed_at,
+        "model_name": entry.get("model_name"),
+        "context_hash": entry.get("context_hash", ""),
+        "response_length": entry.get("response_length", 0),
+        "confidence_assessment": entry.get("confidence_assessment", "unknown"),
+        **{field: list(entry.get(field, [])) for field in _MARKER_FIELDS},
+    }
+
+
+class CognitiveLogWriter:
+    """Buffer en memoria + flush en batch a la tabla cognitive_logs."""
+
+    def __init__(
+        self,
+        batch_size: int = COGNITIVE_LOG_BATCH_SIZE,
+        flush_interval_s: float = COGNITIVE_LOG_FLUSH_S,
+        max_buffer: int = COGNITIVE_LOG_MAX_BUFFER,
+        max_retries: int = COGNITIVE_LOG_MAX_RETRIES,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.session_factory = session_factory
+        self._buffer: "deque[Dict[str, Any]]" = deque()
+        # Batch que falló: se reintenta antes de tomar filas nuevas
+        self._retry_rows: List[Dict[str, Any]] = []
+        self._retry_attempts = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped_overflow": 0,
+            "dropped_failed": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+        }
+        self._last_flush_ms = 0.0
+
+    def enqueue(self, entry: Dict[str, Any]) -> None:
+        """Encola una entrada (no bloquea, no toca la BD)."""
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.popleft()
+            self._stats["dropped_overflow"] += 1
+        self._buffer.append(_to_row(entry))
+        self._stats["enqueued"] += 1
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Lanza el loop de flush (requiere event loop activo)."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Detiene el loop y drena lo pendiente."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._retry_rows or self._buffer:
+            if not await self.flush():
+                break
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Drenar en batches mientras haya filas (p.ej. tras un pico)
+            while self._retry_rows or self._buffer:
+                if not await self.flush():
+                    break
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        if self._retry_rows:
+            return self._retry_rows
+        n = min(self.batch_size, len(self._buffer))
+        return [self._buffer.popleft() for _ in range(n)]
+
+    async def flush(self) -> bool:
+        """Escribe un batch. Retorna False si falló (queda para reintento)."""
+        rows = self._take_batch()
+        if not rows:
+            return True
+
+        t0 = time.perf_counter()
+        try:
+            await self._insert(rows)
+        except Exception as e:
+            self._stats["failed_flushes"] += 1
+            self._retry_attempts += 1
+            if self._retry_attempts > self.max_retries:
+                print(f"[COGNITIVE_LOG] Descartando batch de {len(rows)} tras {self.max_retries} reintentos: {e}")
+                self._stats["dropped_failed"] += len(rows)
+                self._retry_rows = []
+                self._retry_attempts = 0
+            else:
+                print(f"[COGNITIVE_LOG] Flush falló (intento {self._retry_attempts}): {e}")
+                self._retry_rows = rows
+            return False
+
+        self._last_flush_ms = (time.perf_counter() - t0) * 1000
+        self._retry_rows = []
+        self._retry_attempts = 0
+        self._stats["written"] += len(rows)
+        self._stats["flushes"] += 1
+        return True
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        """INSERT multi-fila en una transacción."""
+        async with self.session_factory() as db:
+            await db.execute(insert(CognitiveLog), rows)
+            await db.commit()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "buffered": len(self._buffer) + len(self._retry_rows),
+            "batch_size": self.batch_size,
+            "flush_interval_s": self.flush_interval_s,
+            "max_buffer": self.max_buffer,
+            **self._stats,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+        }
+
+
+# =========================
+# INSTANCIA GLOBAL
+# =========================
+_default_writer: Optional[CognitiveLogWriter] = None
+
+
+def get_cognitive_log_writer() -> CognitiveLogWriter:
+    """Obtiene el writer global de logs cognitivos."""
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = CognitiveLogWriter()
+    return _default_writer
@@ -0,0 +1,38 @@
+"""
+embeddings.py
+
+Embeddings de texto vía Ollama (/api/embed), con el cliente HTTP compartido.
+
+- Un request por batch de textos (Ollama acepta input: list[str])
+- El modelo (OLLAMA_EMBED_MODEL) corre en el mismo host Ollama que el LLM;
+  nomic-embed-text / all-minilm corren bien en CPU
+"""
+
+import os
+from typing import List
+
+from backend.app.services.ollama_client import get_ollama_client
+
+OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+OLLAMA_EMBED_TIMEOUT = float(os.getenv("OLLAMA_EMBED_TIMEOUT", "30.0"))
+
+
+def _ollama_url() -> str:
+    return os.getenv("OLLAMA_URL", "http://localhost:11434")
+
+
+async def embed_texts(texts: List[str], model: str = OLLAMA_EMBED_MODEL) -> List[List[float]]:
+    """Un vector por texto, en el mismo orden. Errores HTTP se propagan."""
+    if not texts:
+        return []
+    client = get_ollama_client()
+    response = await client.post(
+        f"{_ollama_url()}/api/embed",
+        json={"model": model, "input": texts},
+        timeout=OLLAMA_EMBED_TIMEOUT,
+    )
+    response.raise_for_status()
+    embeddings = response.json().get("embeddings") or []
+    if len(embeddings) != len(texts):
+        raise ValueError(f"Ollama retornó {len(embeddings)} embeddings para {len(texts)} textos")
+    return embeddings
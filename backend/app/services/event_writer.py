@@ -0,0 +1,292 @@
+"""
+event_writer.py
+
+Micro-batching de escrituras de alta frecuencia (VoiceEvent / MemoryNode).
+
+- Las filas llegan con ID generado en cliente: sin RETURNING ni refresh
+- Un loop junta lo que llega dentro de una ventana (EVENT_WRITE_WINDOW_MS)
+  o hasta EVENT_WRITE_BATCH filas, y hace un INSERT multi-fila por modelo
+  en una sola transacción (un commit / fsync por ventana, no por dictado)
+- Cola acotada (EVENT_WRITE_MAX_PENDING): si se llena, write() espera
+  (backpressure) en vez de acumular memoria
+
+Durabilidad (EVENT_WRITE_ACK):
+- "flush" (default): write() retorna cuando el batch hizo commit; si el
+  INSERT falla, el error llega al caller
+- "enqueue": write() retorna apenas la fila está en cola. Un batch que
+  falla se reintenta (hasta EVENT_WRITE_MAX_RETRIES) y luego se descarta;
+  una caída del proceso pierde lo que estaba en cola
+
+Errores de datos (IntegrityError / DataError) se aíslan por bisección: solo
+la fila culpable falla. Errores de conexión u operacionales fallan el batch
+completo de una vez (reintentar fila por fila solo carga más a una BD caída).
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from backend.app.db.session import AsyncSessionLocal
+
+EVENT_WRITE_ACK = os.getenv("EVENT_WRITE_ACK", "flush")
+EVENT_WRITE_WINDOW_MS = float(os.getenv("EVENT_WRITE_WINDOW_MS", "10"))
+EVENT_WRITE_BATCH = int(os.getenv("EVENT_WRITE_BATCH", "200"))
+EVENT_WRITE_MAX_PENDING = int(os.getenv("EVENT_WRITE_MAX_PENDING", "10000"))
+EVENT_WRITE_MAX_RETRIES = int(os.getenv("EVENT_WRITE_MAX_RETRIES", "3"))
+EVENT_WRITE_RETRY_BACKOFF_S = float(os.getenv("EVENT_WRITE_RETRY_BACKOFF_S", "0.5"))
+
+ACK_FLUSH = "flush"
+ACK_ENQUEUE = "enqueue"
+
+
+class _PendingWrite:
+    __slots__ = ("model", "row", "future", "attempts")
+
+    def __init__(self, model, row: Dict[str, Any], future: Optional[asyncio.Future]):
+        self.model = model
+        self.row = row
+        self.future = future
+        self.attempts = 0
+
+
+# Marca de cierre en la cola
+_STOP = object()
+
+
+class EventWriter:
+    """Agrupa INSERTs de modelos ORM en batches por ventana de tiempo."""
+
+    def __init__(
+        self,
+        ack: str = EVENT_WRITE_ACK,
+        window_ms: float = EVENT_WRITE_WINDOW_MS,
+        batch_size: int = EVENT_WRITE_BATCH,
+        max_pending: int = EVENT_WRITE_MAX_PENDING,
+        max_retries: int = EVENT_WRITE_MAX_RETRIES,
+        retry_backoff_s: float = EVENT_WRITE_RETRY_BACKOFF_S,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.ack = ack
+        self.window_s = window_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self.session_factory = session_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._queue_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Filas de un batch fallido (modo enqueue): van primero en el próximo flush
+        self._retry: List[_PendingWrite] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "dropped_failed": 0,
+        }
+        self._batch_sizes: List[int] = []
+        self._last_flush_ms = 0.0
+
+    # -------------------------
+    # API
+    # -------------------------
+    async def write(self, model, row: Dict[str, Any], ack: Optional[str] = None) -> None:
+        """Encola una fila (con su id ya generado)."""
+        await self.write_many(model, [row], ack=ack)
+
+    async def write_many(self, model, rows: List[Dict[str, Any]], ack: Optional[str] = None) -> None:
+        """Encola varias filas; con ack "flush" espera el commit de todas."""
+        self.start()
+        wait_flush = (ack or self.ack) == ACK_FLUSH
+        loop = asyncio.get_running_loop()
+        futures = []
+        for row in rows:
+            future = loop.create_future() if wait_flush else None
+            await self._queue.put(_PendingWrite(model, row, future))
+            self._stats["enqueued"] += 1
+            if future is not None:
+                futures.append(future)
+        if futures:
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                raise errors[0]
+
+    def start(self) -> None:
+        """Lanza el loop de flush (idempotente; requiere event loop activo)."""
+        if self._task is not None and not self._task.done():
+            return
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._queue_loop is not loop:
+            # La cola queda ligada a su event loop: en uno nuevo se reemplaza,
+            # y lo que quedaba en la anterior falla en vez de colgar al caller
+            if self._queue is not None:
+                self._abandon_pending(RuntimeError("EventWriter reiniciado en otro event loop"))
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._queue_loop = loop
+        # Mismo loop (p. ej. la task murió): se conserva la cola con lo pendiente
+        self._task = loop.create_task(self._loop())
+
+    def _abandon_pending(self, error: BaseException) -> None:
+        items = self._retry
+        self._retry = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                items.append(item)
+        for item in items:
+            if item.future is None:
+                self._stats["dropped_failed"] += 1
+            elif not item.future.done():
+                try:
+                    item.future.set_exception(error)
+                except RuntimeError:
+                    # Event loop anterior ya cerrado: nadie espera ese future
+                    pass
+
+    async def stop(self) -> None:
+        """Flush de todo lo pendiente y fin del loop (shutdown)."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    # -------------------------
+    # Loop
+    # -------------------------
+    async def _next_batch(self) -> tuple:
+        """(batch, stop): espera la primera fila y junta lo que llegue en la ventana."""
+        if self._retry:
+            batch, self._retry = self._retry, []
+            await asyncio.sleep(self.retry_backoff_s)
+        else:
+            first = await self._queue.get()
+            if first is _STOP:
+                return [], True
+            batch = [first]
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window_s
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _loop(self) -> None:
+        stopping = False
+        batch: List[_PendingWrite] = []
+        try:
+            while not stopping:
+                batch, stopping = await self._next_batch()
+                if batch:
+                    await self._flush(batch)
+                batch = []
+        except BaseException:
+            # La task murió a mitad de un batch: sus callers no quedan colgados
+            for item in batch:
+                self._fail(item, RuntimeError("EventWriter interrumpido durante el flush"))
+            raise
+
+        # Drenar: lo que quedó en cola y los reintentos pendientes
+        while self._retry or not self._queue.empty():
+            batch, self._retry = self._retry, []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    batch.append(item)
+            if batch:
+                # Los reintentos están acotados por attempts (max_retries)
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[_PendingWrite]) -> bool:
+        """Un INSERT multi-fila por modelo, en una transacción."""
+        grouped: Dict[Any, List[Dict[str, Any]]] = {}
+        for item in batch:
+            grouped.setdefault(item.model, []).append(item.row)
+
+        t0 = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                for model, rows in grouped.items():
+                    await db.execute(insert(model), rows)
+                await db.commit()
+        except Exception as e:
+            self._stats["failed_flushes"] += 1
+            print(f"[EVENT_WRITER] Flush de {len(batch)} filas falló: {e}")
+            if len(batch) > 1 and isinstance(e, (IntegrityError, DataError)):
+                # Error de datos: aislar la fila problemática por bisección; el
+                # resto del batch no paga su error (~2·log2(n) flushes por fila mala)
+                mid = len(batch) // 2
+                await self._flush(batch[:mid])
+                await self._flush(batch[mid:])
+                return False
+            # Conexión / operacional (o fila ya aislada): falla todo el batch
+            for item in batch:
+                self._fail(item, e)
+            return False
+
+        self._last_flush_ms = (time.perf_counter() - t0) * 1000
+        self._stats["written"] += len(batch)
+        self._stats["flushes"] += 1
+        self._batch_sizes.append(len(batch))
+        del self._batch_sizes[:-256]
+        for item in batch:
+            if item.future is not None and not item.future.done():
+                item.future.set_result(None)
+        return True
+
+    def _fail(self, item: _PendingWrite, error: BaseException) -> None:
+        if item.future is not None:
+            # ack "flush": el caller recibe el error y decide
+            if not item.future.done():
+                item.future.set_exception(error)
+        else:
+            item.attempts += 1
+            if item.attempts > self.max_retries:
+                self._stats["dropped_failed"] += 1
+            else:
+                self._retry.append(item)
+
+    def metrics(self) -> Dict[str, Any]:
+        sizes = self._batch_sizes
+        return {
+            "ack": self.ack,
+            "running": self._task is not None and not self._task.done(),
+            "pending": (self._queue.qsize() if self._queue else 0) + len(self._retry),
+            "window_ms": round(self.window_s * 1000, 2),
+            "batch_size": self.batch_size,
+            **self._stats,
+            "avg_batch": round(sum(sizes) / len(sizes), 2) if sizes else 0,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+        }
+
+
+# =========================
+# INSTANCIA GLOBAL
+# =========================
+_default_writer: Optional[EventWriter] = None
+
+
+def get_event_writer() -> EventWriter:
+    """Obtiene el writer global de eventos."""
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = EventWriter()
+    return _default_writer
@@ -0,0 +1,138 @@
+"""
+inference_pool.py
+
+Pool dedicado y acotado para inferencias LLM (observer / agente).
+
+- Máximo INFERENCE_WORKERS inferencias simultáneas contra Ollama
+- Cola de espera acotada (INFERENCE_QUEUE_MAX): si está llena, el endpoint
+  responde 429 en vez de acumular trabajo
+- Métricas: profundidad de cola, activas, rechazadas, tiempo de espera
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Set
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+INFERENCE_QUEUE_MAX = int(os.getenv("INFERENCE_QUEUE_MAX", "32"))
+
+
+class InferencePoolFull(Exception):
+    """La cola de inferencias está saturada (backpressure → HTTP 429)."""
+    pass
+
+
+class InferencePool:
+    """Ejecutor async con concurrencia y cola de espera acotadas."""
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_QUEUE_MAX):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._sem = asyncio.Semaphore(workers)
+        self._tasks: Set[asyncio.Task] = set()
+        self._waiting = 0
+        self._active = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self._wait_ms = deque(maxlen=256)
+        self._wait_ms_max = 0.0
+
+    @property
+    def saturated(self) -> bool:
+        # Capacidad total = workers ocupados + cola de espera
+        return self._waiting + self._active >= self.workers + self.max_queue
+
+    def _reserve(self) -> None:
+        """Reserva un lugar en la cola (sin await: atómico en el event loop)."""
+        if self.saturated:
+            self._stats["rejected"] += 1
+            raise InferencePoolFull(
+                f"Cola de inferencia llena ({self._active} activas, {self._waiting} en espera)"
+            )
+        self._waiting += 1
+
+    @asynccontextmanager
+    async def _run_reserved(self):
+        t0 = time.perf_counter()
+        try:
+            await self._sem.acquire()
+        finally:
+            self._waiting -= 1
+        wait_ms = (time.perf_counter() - t0) * 1000
+        self._wait_ms.append(wait_ms)
+        self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Ocupa un worker durante el bloque (p.ej. streaming)."""
+        self._reserve()
+        async with self._run_reserved():
+            yield
+
+    def submit(self, fn, *args) -> asyncio.Task:
+        """
+        Encola fn(*args) (corrutina). Lanza InferencePoolFull si está saturado.
+        Retorna el asyncio.Task: handle cancelable (task.cancel()).
+        """
+        self._reserve()
+        self._stats["submitted"] += 1
+        task = asyncio.create_task(self._run(fn, *args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, fn, *args) -> Any:
+        async with self._run_reserved():
+            try:
+                result = await fn(*args)
+            except asyncio.CancelledError:
+                # Cancelación real: el request HTTP en vuelo se aborta y el slot se libera
+                self._stats["cancelled"] += 1
+                raise
+            except Exception:
+                self._stats["failed"] += 1
+                raise
+            self._stats["completed"] += 1
+            return result
+
+    async def shutdown(self) -> None:
+        """Cancela las inferencias pendientes (shutdown de la app)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_ms)
+        return {
+            "workers": self.workers,
+            "active": self._active,
+            "queue_depth": self._waiting,
+            "queue_max": self.max_queue,
+            **self._stats,
+            "wait_ms_avg": round(sum(waits) / len(waits), 2) if waits else 0,
+            "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0,
+            "wait_ms_max": round(self._wait_ms_max, 2),
+        }
+
+
+# =========================
+# INSTANCIA GLOBAL
+# =========================
+_default_pool: Optional[InferencePool] = None
+
+
+def get_inference_pool() -> InferencePool:
+    """Obtiene el pool global de inferencia."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = InferencePool()
+    return _default_pool
@@ -1,7 +1,9 @@
+import json
 import time
 import os
-import httpx
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, Optional
+
+from backend.app.services.ollama_client import get_ollama_client
 
 # =========================
 # SYSTEM PROMPTS (ROLES)
@@ -73,7 +75,32 @@ def _build_system_prompt(role: str, context: Dict[str, Any]) -> str:
     return f"{base_role}\n\nREGLAS:\n{global_rules}\n{ctx_str}\n\nINSTRUCCIÓN: Actúa según tu rol y el contexto proporcionado."
 
 
-def run_llm(*, provider: str = "openai", **kwargs) -> Dict[str, Any]:
+def _build_ollama_request(user_text: str, system_prompt: str, stream: bool):
+    """Arma (url, payload, timeout) para /api/generate del Agent Core."""
+    ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
+    ollama_model = os.getenv("OLLAMA_MODEL", "llama3")
+    timeout = float(os.getenv("OLLAMA_TIMEOUT", "60.0"))
+
+    url = f"{ollama_url}/api/generate"
+
+    # Combinamos System + User para modelos que no soportan system prompt explícito en generate
+    # O usamos el formato de prompt de Ollama si el modelo lo permite.
+    # Para máxima compatibilidad en raw text completion:
+    final_prompt = f"SYSTEM: {system_prompt}\n\nUSER: {user_text}\n\nASSISTANT:"
+
+    payload = {
+        "model": ollama_model,
+        "prompt": final_prompt,
+        "stream": stream,
+        "options": {
+            "temperature": 0.5, # Un poco más determinista para roles profesionales
+            "num_predict": 1000,
+        }
+    }
+    return url, payload, timeout
+
+
+async def run_llm(*, provider: str = "openai", **kwargs) -> Dict[str, Any]:
     """
     Ejecuta el LLM con soporte para Roles y Contexto SGMI.
     Kwargs: user_text, role, context (dict)
@@ -102,33 +129,14 @@ def run_llm(*, provider: str = "openai", **kwargs) -> Dict[str, Any]:
     # -----------------------------
     # CORE: Ollama (Active Agent)
     # -----------------------------
-    ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-    ollama_model = os.getenv("OLLAMA_MODEL", "llama3")
-    timeout = float(os.getenv("OLLAMA_TIMEOUT", "60.0"))
-
-    url = f"{ollama_url}/api/generate"
-    
-    # Combinamos System + User para modelos que no soportan system prompt explícito en generate
-    # O usamos el formato de prompt de Ollama si el modelo lo permite.
-    # Para máxima compatibilidad en raw text completion:
-    final_prompt = f"SYSTEM: {system_prompt}\n\nUSER: {user_text}\n\nASSISTANT:"
-    
-    payload = {
-        "model": ollama_model,
-        "prompt": final_prompt,
-        "stream": False,
-        "options": {
-            "temperature": 0.5, # Un poco más determinista para roles profesionales
-            "num_predict": 1000,
-        }
-    }
+    url, payload, timeout = _build_ollama_request(user_text, system_prompt, stream=False)
 
     try:
-        with httpx.Client(timeout=timeout) as client:
-            response = client.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
+        client = get_ollama_client()
+        response = await client.post(url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+
         answer = data.get("response", "")
         eval_count = data.get("eval_count", 0)
 
@@ -142,3 +150,70 @@ def run_llm(*, provider: str = "openai", **kwargs) -> Dict[str, Any]:
         "provider": "ollama",
         "llm_ms": round((time.perf_counter() - t0) * 1000, 2),
     }
+
+
+async def stream_llm(*, provider: str = "openai", **kwargs) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Igual que run_llm, pero en modo streaming (NDJSON de Ollama).
+    Emite {"type": "token", "token": str} por cada chunk y al final
+    {"type": "done", "answer", "tokens", "provider", "llm_ms", "ttft_ms"}.
+    """
+
+    t0 = time.perf_counter()
+
+    user_text = kwargs.get("user_text", "")
+    role = kwargs.get("role", "clinical")
+    context = kwargs.get("context", {}) or {}
+
+    system_prompt = _build_system_prompt(role, context)
+
+    if provider in ("none", "mock"):
+        answer = f"[MOCK {role}] Respuesta simulada en español."
+        yield {"type": "token", "token": answer}
+        yield {
+            "type": "done",
+            "answer": answer,
+            "tokens": 0,
+            "provider": provider,
+            "llm_ms": round((time.perf_counter() - t0) * 1000, 2),
+            "ttft_ms": 0,
+        }
+        return
+
+    url, payload, timeout = _build_ollama_request(user_text, system_prompt, stream=True)
+
+    parts = []
+    eval_count = 0
+    ttft_ms = None
+
+    try:
+        client = get_ollama_client()
+        async with client.stream("POST", url, json=payload, timeout=timeout) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("response", "")
+                if token:
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - t0) * 1000, 2)
+                    parts.append(token)
+                    yield {"type": "token", "token": token}
+                if chunk.get("done"):
+                    eval_count = chunk.get("eval_count", 0)
+                    break
+
+    except Exception as e:
+        error = f"Error cognitivo: {str(e)}"
+        parts.append(error)
+        yield {"type": "error", "error": error}
+
+    yield {
+        "type": "done",
+        "answer": "".join(parts),
+        "tokens": eval_count,
+        "provider": "ollama",
+        "llm_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "ttft_ms": ttft_ms or 0,
+    }
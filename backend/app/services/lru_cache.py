@@ -0,0 +1,100 @@
+"""
+lru_cache.py
+
+Cache LRU + TTL en memoria, con métricas (hits / misses / desalojos).
+Pensado para el event loop de FastAPI (sin locks: no hay awaits internos).
+
+Opcional: cota por peso (p. ej. bytes) con weigher + max_weight. El peso
+se mide en set(); un valor que crece se vuelve a pesar con otro set().
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """LRU acotado por tamaño, con expiración por TTL."""
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl_s: Optional[float] = None,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.max_weight = max_weight
+        self.weigher = weigher
+        # key -> (instante de inserción, valor, peso); el final del OrderedDict es el más reciente
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._weight = 0
+        self._stats = {"hits": 0, "misses": 0, "evicted_ttl": 0, "evicted_capacity": 0}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._peek(key) is not None
+
+    def _peek(self, key: Hashable) -> Optional[tuple]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if self.ttl_s is not None and time.monotonic() - item[0] > self.ttl_s:
+            del self._data[key]
+            self._weight -= item[2]
+            self._stats["evicted_ttl"] += 1
+            return None
+        return item
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._peek(key)
+        if item is None:
+            self._stats["misses"] += 1
+            return default
+        self._data.move_to_end(key)
+        self._stats["hits"] += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        weight = self.weigher(value) if self.weigher is not None else 0
+        previous = self._data.get(key)
+        if previous is not None:
+            self._weight -= previous[2]
+        self._data[key] = (time.monotonic(), value, weight)
+        self._data.move_to_end(key)
+        self._weight += weight
+        while len(self._data) > self.max_size:
+            self._evict_oldest()
+        # El más reciente se conserva aunque por sí solo supere max_weight
+        while self.max_weight is not None and self._weight > self.max_weight and len(self._data) > 1:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        _, item = self._data.popitem(last=False)
+        self._weight -= item[2]
+        self._stats["evicted_capacity"] += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+        self._weight -= item[2]
+        return item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._weight = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            **({"weight": self._weight, "max_weight": self.max_weight} if self.weigher is not None else {}),
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,385 @@
+"""
+memory_recall.py
+
+Recall semántico de la memoria personal (MemoryNode, modo LIFE).
+
+- enqueue() tras insertar un nodo: síncrono y O(1). Un loop en background
+  embebe en batch (Ollama /api/embed) y persiste en memory_embeddings
+- El store de un usuario (vector_index.UserVectorStore) se carga de la BD
+  en su primer recall y queda en un LRU acotado por bytes
+  (MEMORY_RECALL_MAX_MB) y por usuarios (MEMORY_RECALL_MAX_USERS); los
+  embeddings nuevos se agregan en caliente, también los que se escriben
+  mientras el store se está cargando
+- Al cargar un usuario, sus nodos sin embedding se encolan (backfill):
+  cubre nodos previos a esta feature y batches que fallaron
+- La búsqueda (NumPy) corre en un thread: no bloquea el event loop
+- Sin NumPy o con MEMORY_RECALL_ENABLED=0 el recall queda deshabilitado
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+
+from backend.app.db.session import AsyncSessionLocal
+from backend.app.models.memory_embedding import MemoryEmbedding
+from backend.app.models.memory_node import MemoryNode
+from backend.app.models.voice_event import is_sqlite, to_db_uuid
+from backend.app.services.embeddings import OLLAMA_EMBED_MODEL, embed_texts
+from backend.app.services.lru_cache import LRUCache
+from backend.app.services.single_flight import SingleFlight
+from backend.app.services.vector_index import UserVectorStore, normalize, np
+
+MEMORY_RECALL_ENABLED = os.getenv("MEMORY_RECALL_ENABLED", "1") not in ("0", "false", "False")
+MEMORY_EMBED_BATCH = int(os.getenv("MEMORY_EMBED_BATCH", "32"))
+MEMORY_EMBED_FLUSH_S = float(os.getenv("MEMORY_EMBED_FLUSH_S", "0.5"))
+MEMORY_EMBED_MAX_PENDING = int(os.getenv("MEMORY_EMBED_MAX_PENDING", "10000"))
+# Batch fallido (Ollama / BD): reintentos con backoff exponencial, luego descarte
+MEMORY_EMBED_MAX_RETRIES = int(os.getenv("MEMORY_EMBED_MAX_RETRIES", "5"))
+MEMORY_EMBED_RETRY_BACKOFF_S = float(os.getenv("MEMORY_EMBED_RETRY_BACKOFF_S", "2.0"))
+MEMORY_RECALL_MAX_USERS = int(os.getenv("MEMORY_RECALL_MAX_USERS", "64"))
+# Presupuesto de stores en memoria. Un store ocupa filas × dim × 4 bytes:
+# 100k memorias × 768 dims ≈ 293 MB (+ listas IVF ≈ 0.4 MB), así que 1024 MB
+# alcanzan para ~3 usuarios de ese tamaño o cientos de usuarios típicos
+# (1k memorias ≈ 3 MB). Subirlo según usuarios activos × memorias por usuario
+MEMORY_RECALL_MAX_MB = int(os.getenv("MEMORY_RECALL_MAX_MB", "1024"))
+
+if is_sqlite:
+    from sqlalchemy.dialects.sqlite import insert
+else:
+    from sqlalchemy.dialects.postgresql import insert
+
+
+class RecallUnavailable(RuntimeError):
+    """NumPy no instalado o recall deshabilitado por entorno."""
+
+
+class MemoryRecall:
+    """Pipeline de embeddings + stores por usuario + búsqueda top-k."""
+
+    def __init__(
+        self,
+        model: str = OLLAMA_EMBED_MODEL,
+        batch_size: int = MEMORY_EMBED_BATCH,
+        flush_interval_s: float = MEMORY_EMBED_FLUSH_S,
+        max_pending: int = MEMORY_EMBED_MAX_PENDING,
+        max_retries: int = MEMORY_EMBED_MAX_RETRIES,
+        retry_backoff_s: float = MEMORY_EMBED_RETRY_BACKOFF_S,
+        max_users: int = MEMORY_RECALL_MAX_USERS,
+        max_bytes: int = MEMORY_RECALL_MAX_MB * 2**20,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self.session_factory = session_factory
+        # (node_id, user_id, content) pendientes de embeber
+        self._pending: "deque[tuple]" = deque()
+        # Nodos en cola o en vuelo: evita duplicados entre insert y backfill
+        self._queued = set()
+        # Nodos de batches fallidos: (listo_en, nodo) y reintentos por nodo
+        self._retry: "deque[tuple]" = deque()
+        self._attempts: Dict[str, int] = {}
+        self._stores = LRUCache(max_size=max_users, max_weight=max_bytes, weigher=lambda store: store.nbytes)
+        # Usuarios cargándose: embeddings escritos durante la carga (ids, vectores)
+        self._loading: Dict[str, List[tuple]] = {}
+        self._loads = SingleFlight()
+        self._training: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "enqueued": 0,
+            "embedded": 0,
+            "dropped_overflow": 0,
+            "failed_batches": 0,
+            "retried": 0,
+            "dropped_failed": 0,
+            "backfilled": 0,
+            "recalls": 0,
+        }
+        self._last_embed_ms = 0.0
+        self._last_search_ms = 0.0
+
+    @property
+    def available(self) -> bool:
+        return MEMORY_RECALL_ENABLED and np is not None
+
+    # -------------------------
+    # Pipeline de embeddings
+    # -------------------------
+    def enqueue(self, node_id, user_id, content: str) -> None:
+        """Encola un nodo recién insertado (no bloquea, no toca la BD)."""
+        if not self.available or not content:
+            return
+        key = str(node_id)
+        if key in self._queued:
+            return
+        if len(self._pending) >= self.max_pending:
+            # Lo descartado se recupera vía backfill al cargar el usuario
+            dropped = self._pending.popleft()
+            self._queued.discard(str(dropped[0]))
+            self._stats["dropped_overflow"] += 1
+        self._pending.append((node_id, user_id, content))
+        self._queued.add(key)
+        self._stats["enqueued"] += 1
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Lanza el loop de embeddings (requiere event loop activo)."""
+        if not self.available:
+            return
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Detiene el loop. Lo pendiente se recupera vía backfill."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._requeue_ready()
+            while self._pending:
+                await self._embed_batch()
+
+    def _requeue_ready(self) -> None:
+        """Reintentos cuyo backoff venció vuelven al frente de la cola."""
+        now = time.monotonic()
+        ready = []
+        while self._retry and self._retry[0][0] <= now:
+            ready.append(self._retry.popleft()[1])
+        self._pending.extendleft(reversed(ready))
+        self._stats["retried"] += len(ready)
+
+    def _retry_later(self, batch: List[tuple]) -> None:
+        """Re-encola un batch fallido; tras max_retries el nodo se descarta
+        (lo recupera el backfill cuando se vuelva a cargar el usuario)."""
+        now = time.monotonic()
+        for item in batch:
+            key = str(item[0])
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts > self.max_retries:
+                self._attempts.pop(key, None)
+                self._queued.discard(key)
+                self._stats["dropped_failed"] += 1
+                continue
+            self._attempts[key] = attempts
+            # Sigue en _queued: un enqueue del mismo nodo no lo duplica
+            self._retry.append((now + self.retry_backoff_s * 2 ** (attempts - 1), item))
+        # Orden por instante de reintento (los batches tienen distintos intentos)
+        if len(self._retry) > 1 and self._retry[-1][0] < self._retry[-2][0]:
+            self._retry = deque(sorted(self._retry, key=lambda entry: entry[0]))
+
+    async def _embed_batch(self) -> None:
+        n = min(self.batch_size, len(self._pending))
+        batch = [self._pending.popleft() for _ in range(n)]
+        t0 = time.perf_counter()
+        try:
+            vectors = normalize(await embed_texts([content for _, _, content in batch], model=self.model))
+            rows = [
+                {
+                    "node_id": to_db_uuid(node_id),
+                    "model": self.model,
+                    "user_id": to_db_uuid(user_id),
+                    "dim": vectors.shape[1],
+                    "vector": vectors[i].astype("<f4").tobytes(),
+                }
+                for i, (node_id, user_id, _) in enumerate(batch)
+            ]
+            async with self.session_factory() as db:
+                # Un nodo ya embebido (carrera backfill / insert) no tumba el batch
+                await db.execute(insert(MemoryEmbedding).on_conflict_do_nothing(), rows)
+                await db.commit()
+        except Exception as e:
+            self._stats["failed_batches"] += 1
+            print(f"[MEMORY_RECALL] Batch de {len(batch)} embeddings falló: {e}")
+            self._retry_later(batch)
+            return
+        except BaseException:
+            # Cancelado (stop): sin marca de "en cola", el backfill los recupera
+            for node_id, _, _ in batch:
+                self._queued.discard(str(node_id))
+            raise
+
+        for node_id, _, _ in batch:
+            self._queued.discard(str(node_id))
+            self._attempts.pop(str(node_id), None)
+
+        self._last_embed_ms = (time.perf_counter() - t0) * 1000
+        self._stats["embedded"] += len(batch)
+
+        # Stores ya cargados: agregar en caliente
+        by_user: Dict[str, List[int]] = {}
+        for i, (_, user_id, _) in enumerate(batch):
+            by_user.setdefault(str(user_id), []).append(i)
+        for user_key, positions in by_user.items():
+            ids = [str(batch[i][0]) for i in positions]
+            if user_key in self._loading:
+                # El SELECT de la carga puede no verlos: se aplican al terminar
+                self._loading[user_key].append((ids, vectors[positions]))
+                continue
+            store = self._stores.get(user_key)
+            if store is not None and store.dim == vectors.shape[1]:
+                store.add(ids, vectors[positions])
+                # Re-pesar: el store pudo crecer
+                self._stores.set(user_key, store)
+                self._maybe_train(user_key, store)
+
+    # -------------------------
+    # Stores por usuario
+    # -------------------------
+    async def _load_store(self, user_id) -> Optional[UserVectorStore]:
+        user_key = str(user_id)
+        self._loading[user_key] = []
+        try:
+            async with self.session_factory() as db:
+                rows = (await db.execute(
+                    select(MemoryEmbedding.node_id, MemoryEmbedding.dim, MemoryEmbedding.vector)
+                    .where(MemoryEmbedding.user_id == to_db_uuid(user_id))
+                    .where(MemoryEmbedding.model == self.model)
+                )).all()
+
+                embedded = select(MemoryEmbedding.node_id).where(MemoryEmbedding.model == self.model)
+                missing = (await db.execute(
+                    select(MemoryNode.id, MemoryNode.content)
+                    .where(MemoryNode.user_id == to_db_uuid(user_id))
+                    .where(MemoryNode.id.not_in(embedded))
+                    .limit(self.max_pending)
+                )).all()
+        finally:
+            written = self._loading.pop(user_key)
+
+        for node_id, content in missing:
+            if str(node_id) not in self._queued:
+                self._stats["backfilled"] += 1
+            self.enqueue(node_id, user_id, content)
+
+        store = None
+        if rows:
+            dim = rows[0].dim
+            rows = [r for r in rows if r.dim == dim]
+            # Una sola matriz del tamaño exacto, que el store adopta sin copiar
+            matrix = np.empty((len(rows), dim), dtype=np.float32)
+            for i, r in enumerate(rows):
+                matrix[i] = np.frombuffer(r.vector, dtype="<f4")
+            store = UserVectorStore.from_matrix([str(r.node_id) for r in rows], matrix)
+        elif written:
+            store = UserVectorStore(written[0][1].shape[1])
+
+        if store is not None:
+            # Embeddings escritos durante la carga (add ignora los ya leídos)
+            for ids, vectors in written:
+                if vectors.shape[1] == store.dim:
+                    store.add(ids, vectors)
+            self._stores.set(user_key, store)
+            self._maybe_train(user_key, store)
+        return store
+
+    async def _get_store(self, user_id) -> Optional[UserVectorStore]:
+        user_key = str(user_id)
+        store = self._stores.get(user_key)
+        if store is None:
+            store = await self._loads.do(user_key, lambda: self._load_store(user_id))
+        return store
+
+    def _maybe_train(self, user_key: str, store: UserVectorStore) -> None:
+        """Sobre el umbral: entrena el IVF en un thread (una vez por usuario a la vez)."""
+        if user_key in self._training or not store.needs_training():
+            return
+        self._training.add(user_key)
+        task = asyncio.ensure_future(asyncio.to_thread(store.train))
+        task.add_done_callback(lambda _: self._training.discard(user_key))
+
+    # -------------------------
+    # Recall
+    # -------------------------
+    async def recall(self, user_id, query: str, k: int = 10) -> Dict[str, Any]:
+        """Top-k memorias del usuario más cercanas a la query."""
+        if not self.available:
+            raise RecallUnavailable("numpy no instalado o MEMORY_RECALL_ENABLED=0")
+        self._stats["recalls"] += 1
+
+        t0 = time.perf_counter()
+        query_vector = normalize(await embed_texts([query], model=self.model))[0]
+        embed_ms = (time.perf_counter() - t0) * 1000
+
+        store = await self._get_store(user_id)
+        hits = []
+        search_ms = 0.0
+        if store is not None and store.dim == len(query_vector):
+            t1 = time.perf_counter()
+            hits = await asyncio.to_thread(store.search, query_vector, k)
+            search_ms = (time.perf_counter() - t1) * 1000
+            self._last_search_ms = search_ms
+
+        nodes = {}
+        if hits:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(MemoryNode.id, MemoryNode.content, MemoryNode.created_at)
+                    .where(MemoryNode.id.in_([to_db_uuid(node_id) for node_id, _ in hits]))
+                )
+                nodes = {str(row.id): row for row in result}
+
+        return {
+            "index": store.index_kind if store is not None else "empty",
+            "size": len(store) if store is not None else 0,
+            "embed_ms": round(embed_ms, 2),
+            "search_ms": round(search_ms, 3),
+            "hits": [
+                {
+                    "id": node_id,
+                    "score": round(score, 6),
+                    "content": nodes[node_id].content,
+                    "created_at": nodes[node_id].created_at.isoformat() if nodes[node_id].created_at else None,
+                }
+                for node_id, score in hits
+                if node_id in nodes
+            ],
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "model": self.model,
+            "running": self._task is not None and not self._task.done(),
+            "pending": len(self._pending),
+            "retry_pending": len(self._retry),
+            **self._stats,
+            "users_loaded": len(self._stores),
+            "stores_mb": round(self._stores.metrics()["weight"] / 2**20, 1),
+            "last_embed_ms": round(self._last_embed_ms, 2),
+            "last_search_ms": round(self._last_search_ms, 3),
+        }
+
+
+# =========================
+# INSTANCIA GLOBAL
+# =========================
+_default_recall: Optional[MemoryRecall] = None
+
+
+def get_memory_recall() -> MemoryRecall:
+    """Obtiene el servicio global de recall semántico."""
+    global _default_recall
+    if _default_recall is None:
+        _default_recall = MemoryRecall()
+    return _default_recall
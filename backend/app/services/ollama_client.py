@@ -0,0 +1,60 @@
+"""
+ollama_client.py
+
+Cliente HTTP compartido (httpx.AsyncClient) para todas las llamadas a Ollama.
+
+- Una sola instancia por proceso (vida = vida de la app FastAPI)
+- Pool de conexiones con keep-alive: evita handshake TCP por inferencia
+- Se crea en startup y se cierra en shutdown (main.py)
+"""
+
+import os
+from typing import Optional
+
+import httpx
+
+# =========================
+# CONFIGURACIÓN POOL
+# =========================
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "20"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "10"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "120.0"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5.0"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    """
+    Todas las llamadas van al mismo host Ollama, por lo que los límites
+    del pool equivalen a límites por host.
+    """
+    limits = httpx.Limits(
+        max_connections=OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections=OLLAMA_MAX_KEEPALIVE,
+        keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+    )
+    # El timeout de lectura se define por request (observer / agente / warmup)
+    timeout = httpx.Timeout(60.0, connect=OLLAMA_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """Obtiene el cliente compartido (lo crea si aún no existe)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def start_ollama_client() -> None:
+    """Inicializa el cliente en startup de FastAPI."""
+    get_ollama_client()
+
+
+async def close_ollama_client() -> None:
+    """Cierra el pool de conexiones en shutdown de FastAPI."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,54 @@
+"""
+single_flight.py
+
+Coalescing de llamadas concurrentes idénticas (single-flight).
+
+Si llega una llamada con una clave que ya está en vuelo, se adjunta a la
+misma corrutina en vez de lanzar otra. Todas reciben el mismo resultado.
+Si todos los interesados se cancelan, la llamada compartida también.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplica corrutinas concurrentes por clave."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            # shield: cancelar a un interesado no aborta la llamada de los demás
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"inflight": len(self._inflight), **self._stats}
@@ -0,0 +1,343 @@
+"""
+task_store.py
+
+Store de tasks en background (observer / agente) con memoria acotada.
+
+- Lookup O(1) por task_id
+- Tasks terminadas expiran por TTL y se desalojan por tamaño máximo
+- Índice aparte de tasks en proceso: el supervisor no recorre todo el store
+- Contadores de hits / misses / desalojos para observabilidad
+
+Backends (TASK_STORE_BACKEND):
+- "memory" (default): dicts del proceso, un solo worker uvicorn
+- "redis": compartido entre workers (REDIS_URL).
+  Con REDIS_URL=memory:// se usa InMemoryRedis, un doble local del
+  protocolo para desarrollo y pruebas sin servidor Redis.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+TASK_STORE_BACKEND = os.getenv("TASK_STORE_BACKEND", "memory")
+TASK_STORE_MAX_SIZE = int(os.getenv("TASK_STORE_MAX_SIZE", "1000"))
+TASK_STORE_TTL_S = float(os.getenv("TASK_STORE_TTL_S", "600"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Lecturas por worker entre volcados de hits / misses a Redis
+TASK_STORE_STATS_FLUSH_EVERY = int(os.getenv("TASK_STORE_STATS_FLUSH_EVERY", "100"))
+
+PROCESSING = "processing"
+
+
+class TaskStore:
+    """Store en memoria del proceso, acotado, con expiración de tasks terminadas."""
+
+    # Otros workers no comparten estas tasks
+    shared = False
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = TASK_STORE_MAX_SIZE,
+        ttl_s: float = TASK_STORE_TTL_S,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        # task_id -> instante de inicio (orden de inserción = orden de inicio)
+        self._processing: "OrderedDict[str, float]" = OrderedDict()
+        # task_id -> instante de término (orden de inserción = orden de término)
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evicted_ttl": 0,
+            "evicted_capacity": 0,
+        }
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        task = self._tasks.get(task_id)
+        if task is None:
+            self._stats["misses"] += 1
+        else:
+            self._stats["hits"] += 1
+        return task
+
+    async def create(self, task_id: str) -> Dict[str, Any]:
+        """Registra una task nueva en estado `processing`."""
+        await self.prune()
+        entry = {"status": PROCESSING, "started_at": datetime.now().isoformat()}
+        self._tasks[task_id] = entry
+        self._processing[task_id] = time.monotonic()
+        return entry
+
+    async def finish(self, task_id: str, entry: Dict[str, Any]) -> bool:
+        """
+        Guarda el resultado final de una task.
+        Solo transiciona desde `processing`: un resultado tardío nunca pisa
+        un estado terminal (p.ej. TIMEOUT_SUPERVISOR). Retorna si se aplicó.
+        """
+        task = self._tasks.get(task_id)
+        if task is None or task["status"] != PROCESSING:
+            return False
+        self._tasks[task_id] = entry
+        self._processing.pop(task_id, None)
+        self._finished.pop(task_id, None)
+        self._finished[task_id] = time.monotonic()
+        await self.prune()
+        return True
+
+    async def timed_out(self, max_age_s: float) -> List[str]:
+        """Tasks en proceso hace más de max_age_s (solo recorre las más antiguas)."""
+        now = time.monotonic()
+        expired = []
+        for task_id, started in self._processing.items():
+            if now - started <= max_age_s:
+                break
+            expired.append(task_id)
+        return expired
+
+    async def prune(self) -> None:
+        """Desaloja tasks terminadas por TTL y luego por capacidad."""
+        now = time.monotonic()
+        while self._finished:
+            task_id, finished = next(iter(self._finished.items()))
+            if now - finished <= self.ttl_s:
+                break
+            self._evict(task_id, "evicted_ttl")
+
+        # Las tasks en proceso nunca se desalojan
+        while len(self._tasks) > self.max_size and self._finished:
+            task_id = next(iter(self._finished))
+            self._evict(task_id, "evicted_capacity")
+
+    def _evict(self, task_id: str, reason: str) -> None:
+        self._finished.pop(task_id, None)
+        self._tasks.pop(task_id, None)
+        self._stats[reason] += 1
+
+    async def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "size": len(self._tasks),
+            "processing": len(self._processing),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            **self._stats,
+        }
+
+
+class RedisTaskStore:
+    """
+    Store compartido vía protocolo Redis.
+
+    Claves (prefijo vortex:tasks:<name>):
+    - :task:<id>     JSON de la task (EX = ttl; en proceso, EX = 2 * ttl)
+    - :done:<id>     marca terminal (SET NX): primer resultado gana
+    - :processing    ZSET task_id -> epoch de inicio (índice del supervisor)
+    - :finished      ZSET task_id -> epoch de término (desalojo por capacidad)
+    - :stats         HASH de contadores
+
+    hits / misses se acumulan en el worker y se vuelcan cada
+    stats_flush_every lecturas (y en prune / metrics): el polling de
+    estado hace un solo round trip por GET.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        name: str,
+        client,
+        max_size: int = TASK_STORE_MAX_SIZE,
+        ttl_s: float = TASK_STORE_TTL_S,
+        stats_flush_every: int = TASK_STORE_STATS_FLUSH_EVERY,
+    ):
+        self.name = name
+        self.client = client
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.stats_flush_every = stats_flush_every
+        self._prefix = f"vortex:tasks:{name}"
+        self._pending_stats = {"hits": 0, "misses": 0}
+
+    def _key(self, task_id: str) -> str:
+        return f"{self._prefix}:task:{task_id}"
+
+    def _ex(self, factor: float = 1) -> int:
+        # EX en segundos enteros: un ttl_s < 1 no puede truncarse a 0 (Redis lo rechaza)
+        return max(1, int(self.ttl_s * factor))
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(self._key(task_id))
+        self._pending_stats["misses" if raw is None else "hits"] += 1
+        if sum(self._pending_stats.values()) >= self.stats_flush_every:
+            await self._flush_stats()
+        return json.loads(raw) if raw is not None else None
+
+    async def _flush_stats(self) -> None:
+        pending = {k: v for k, v in self._pending_stats.items() if v}
+        if not pending:
+            return
+        self._pending_stats = {"hits": 0, "misses": 0}
+        for stat, amount in pending.items():
+            await self.client.hincrby(f"{self._prefix}:stats", stat, amount)
+
+    async def create(self, task_id: str) -> Dict[str, Any]:
+        entry = {"status": PROCESSING, "started_at": datetime.now().isoformat()}
+        await self.client.set(self._key(task_id), json.dumps(entry), ex=self._ex(2))
+        await self.client.zadd(f"{self._prefix}:processing", {task_id: time.time()})
+        return entry
+
+    async def finish(self, task_id: str, entry: Dict[str, Any]) -> bool:
+        if not await self.client.exists(self._key(task_id)):
+            return False
+        # SET NX atómico: un resultado tardío no pisa un estado terminal
+        claimed = await self.client.set(
+            f"{self._prefix}:done:{task_id}", "1", ex=self._ex(), nx=True
+        )
+        if not claimed:
+            return False
+        await self.client.set(self._key(task_id), json.dumps(entry), ex=self._ex())
+        await self.client.zrem(f"{self._prefix}:processing", task_id)
+        await self.client.zadd(f"{self._prefix}:finished", {task_id: time.time()})
+        await self.prune()
+        return True
+
+    async def timed_out(self, max_age_s: float) -> List[str]:
+        return list(await self.client.zrangebyscore(
+            f"{self._prefix}:processing", "-inf", time.time() - max_age_s
+        ))
+
+    async def prune(self) -> None:
+        """El TTL lo aplica Redis (EX); aquí se recortan índices y capacidad."""
+        finished_key = f"{self._prefix}:finished"
+        stats_key = f"{self._prefix}:stats"
+        await self._flush_stats()
+
+        expired = await self.client.zrangebyscore(
+            finished_key, "-inf", time.time() - self.ttl_s
+        )
+        if expired:
+            await self.client.zrem(finished_key, *expired)
+            await self.client.hincrby(stats_key, "evicted_ttl", len(expired))
+
+        excess = await self.client.zcard(finished_key) - self.max_size
+        if excess > 0:
+            popped = await self.client.zpopmin(finished_key, excess)
+            ids = [task_id for task_id, _ in popped]
+            await self.client.delete(
+                *[self._key(t) for t in ids],
+                *[f"{self._prefix}:done:{t}" for t in ids],
+            )
+            await self.client.hincrby(stats_key, "evicted_capacity", len(ids))
+
+    async def metrics(self) -> Dict[str, Any]:
+        await self._flush_stats()
+        stats = await self.client.hgetall(f"{self._prefix}:stats")
+        processing = await self.client.zcard(f"{self._prefix}:processing")
+        finished = await self.client.zcard(f"{self._prefix}:finished")
+        return {
+            "backend": "redis",
+            "size": processing + finished,
+            "processing": processing,
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "hits": int(stats.get("hits", 0)),
+            "misses": int(stats.get("misses", 0)),
+            "evicted_ttl": int(stats.get("evicted_ttl", 0)),
+            "evicted_capacity": int(stats.get("evicted_capacity", 0)),
+        }
+
+
+class InMemoryRedis:
+    """
+    Doble local del subconjunto de comandos Redis que usa RedisTaskStore
+    (misma firma async que redis.asyncio, respuestas decodificadas).
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and time.time() >= deadline:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    async def get(self, key):
+        return self._data[key] if self._alive(key) else None
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and self._alive(key):
+            return None
+        self._data[key] = value
+        if ex is not None:
+            self._expires[key] = time.time() + ex
+        else:
+            self._expires.pop(key, None)
+        return True
+
+    async def exists(self, *keys):
+        return sum(1 for k in keys if self._alive(k))
+
+    async def delete(self, *keys):
+        removed = 0
+        for k in keys:
+            if self._alive(k):
+                removed += 1
+            self._data.pop(k, None)
+            self._expires.pop(k, None)
+        return removed
+
+    async def hincrby(self, key, field, amount=1):
+        h = self._data.setdefault(key, {})
+        h[field] = str(int(h.get(field, 0)) + amount)
+        return int(h[field])
+
+    async def hgetall(self, key):
+        return dict(self._data.get(key, {})) if self._alive(key) else {}
+
+    async def zadd(self, key, mapping):
+        z = self._data.setdefault(key, {})
+        added = sum(1 for m in mapping if m not in z)
+        z.update(mapping)
+        return added
+
+    async def zrem(self, key, *members):
+        z = self._data.get(key, {})
+        return sum(1 for m in members if z.pop(m, None) is not None)
+
+    async def zcard(self, key):
+        return len(self._data.get(key, {}))
+
+    async def zrangebyscore(self, key, min, max):
+        lo = float(min)
+        hi = float(max)
+        z = self._data.get(key, {})
+        return [m for m, s in sorted(z.items(), key=lambda i: i[1]) if lo <= s <= hi]
+
+    async def zpopmin(self, key, count=1):
+        z = self._data.get(key, {})
+        popped = sorted(z.items(), key=lambda i: i[1])[:count]
+        for m, _ in popped:
+            del z[m]
+        return popped
+
+
+def create_task_store(name: str):
+    """Crea el store según TASK_STORE_BACKEND."""
+    if TASK_STORE_BACKEND == "redis":
+        if REDIS_URL.startswith("memory://"):
+            client = InMemoryRedis()
+        else:
+            import redis.asyncio as aioredis  # dependencia opcional
+            client = aioredis.from_url(REDIS_URL, decode_responses=True)
+        return RedisTaskStore(name, client)
+    return TaskStore(name)
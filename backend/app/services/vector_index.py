@@ -0,0 +1,239 @@
+"""
+vector_index.py
+
+Store de vectores por usuario para el recall semántico (NumPy opcional).
+
+- Matriz float32 contigua que crece en forma geométrica (x1.5): 4 bytes
+  por dimensión, sin listas de floats de Python
+- Vectores normalizados: similitud coseno = producto punto
+- Hasta MEMORY_ANN_THRESHOLD vectores: top-k exacto (un matmul + argpartition)
+- Sobre el umbral: índice IVF (k-means esférico + listas invertidas) que
+  solo recorre las MEMORY_IVF_NPROBE listas más cercanas a la query.
+  Se entrena en un thread; mientras tanto se sigue usando el exacto.
+  Se re-entrena cuando el store duplica el tamaño del último entrenamiento
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Sin NumPy el recall semántico queda deshabilitado
+    np = None
+
+MEMORY_ANN_THRESHOLD = int(os.getenv("MEMORY_ANN_THRESHOLD", "20000"))
+MEMORY_IVF_NPROBE = int(os.getenv("MEMORY_IVF_NPROBE", "16"))
+MEMORY_IVF_TRAIN_ITERS = int(os.getenv("MEMORY_IVF_TRAIN_ITERS", "10"))
+
+# Muestra de entrenamiento por centroide / filas por chunk al asignar listas
+_TRAIN_SAMPLE_PER_LIST = 64
+_ASSIGN_CHUNK = 8192
+# Crecimiento de la matriz: holgura acotada al 50% (no x2 del tamaño útil)
+_GROWTH = 1.5
+_MIN_CAPACITY = 64
+
+
+def normalize(vectors) -> "np.ndarray":
+    """float32 con norma 1 por fila (filas nulas quedan en cero)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: "np.ndarray", k: int) -> "np.ndarray":
+    """Índices de los k mayores, ordenados de mayor a menor."""
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _assign(vectors: "np.ndarray", centroids: "np.ndarray") -> "np.ndarray":
+    """Centroide más cercano (coseno) de cada fila, por chunks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        chunk = vectors[start:start + _ASSIGN_CHUNK]
+        out[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """Listas invertidas sobre centroides de k-means esférico."""
+
+    def __init__(self, centroids: "np.ndarray", lists: List["np.ndarray"]):
+        self.centroids = centroids
+        self.lists = lists
+
+    @classmethod
+    def train(
+        cls,
+        vectors: "np.ndarray",
+        nlist: Optional[int] = None,
+        iters: int = MEMORY_IVF_TRAIN_ITERS,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        n = len(vectors)
+        nlist = nlist or int(min(4096, max(8, np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(n, nlist * _TRAIN_SAMPLE_PER_LIST)
+        sample = vectors[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iters):
+            assign = _assign(sample, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            new_centroids = centroids.copy()
+            new_centroids[filled] = sums
+            # Centroides vacíos: se re-siembran con filas al azar
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                new_centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+            centroids = normalize(new_centroids)
+
+        assign = _assign(vectors, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist))))
+        lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+        return cls(centroids, lists)
+
+    def add(self, rows: "np.ndarray", vectors: "np.ndarray") -> None:
+        for row, target in zip(rows, _assign(vectors, self.centroids)):
+            self.lists[target] = np.append(self.lists[target], np.int32(row))
+
+    def candidates(self, query: "np.ndarray", nprobe: int, k: int) -> "np.ndarray":
+        """Filas de las nprobe listas más cercanas (al menos k si hay)."""
+        ranked = np.argsort(-(self.centroids @ query))
+        picked, total = [], 0
+        for position, target in enumerate(ranked):
+            if position >= nprobe and total >= k:
+                break
+            picked.append(self.lists[target])
+            total += len(self.lists[target])
+        return np.concatenate(picked) if picked else np.empty(0, dtype=np.int32)
+
+
+class UserVectorStore:
+    """Vectores de un usuario: ids + matriz float32 + índice IVF opcional."""
+
+    def __init__(self, dim: int, capacity: int = _MIN_CAPACITY):
+        self.dim = dim
+        self._matrix = np.empty((capacity, dim), dtype=np.float32)
+        self._ids: List[Any] = []
+        self._id_set = set()
+        self._n = 0
+        self._index: Optional[IVFIndex] = None
+        self._trained_at = 0
+        self._training = False
+        # add() corre en el event loop y train() en un thread
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_matrix(cls, ids: List[Any], matrix: "np.ndarray") -> "UserVectorStore":
+        """Adopta una matriz float32 ya normalizada (ids únicos) sin copiarla."""
+        store = cls(matrix.shape[1], capacity=0)
+        store._matrix = matrix
+        store._ids = list(ids)
+        store._id_set = set(store._ids)
+        store._n = len(store._ids)
+        return store
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria reservada: matriz (capacidad, no solo filas usadas) + índice."""
+        total = self._matrix.nbytes
+        index = self._index
+        if index is not None:
+            total += index.centroids.nbytes + sum(rows.nbytes for rows in index.lists)
+        return total
+
+    @property
+    def index_kind(self) -> str:
+        return "ivf" if self._index is not None else "exact"
+
+    def add(self, ids: Sequence[Any], vectors: "np.ndarray") -> int:
+        """Agrega vectores ya normalizados. Ignora ids repetidos."""
+        keep = [i for i, node_id in enumerate(ids) if node_id not in self._id_set]
+        if not keep:
+            return 0
+        vectors = vectors[keep]
+        with self._lock:
+            start, end = self._n, self._n + len(keep)
+            if end > len(self._matrix):
+                capacity = max(end, int(len(self._matrix) * _GROWTH), _MIN_CAPACITY)
+                grown = np.empty((capacity, self.dim), dtype=np.float32)
+                grown[:start] = self._matrix[:start]
+                # Búsquedas en curso conservan la matriz anterior (vista [:n])
+                self._matrix = grown
+            self._matrix[start:end] = vectors
+            for i in keep:
+                self._ids.append(ids[i])
+                self._id_set.add(ids[i])
+            if self._index is not None:
+                self._index.add(np.arange(start, end), vectors)
+            self._n = end
+        return len(keep)
+
+    def needs_training(self, threshold: int = MEMORY_ANN_THRESHOLD) -> bool:
+        return (
+            not self._training
+            and self._n >= threshold
+            and self._n >= 2 * self._trained_at
+        )
+
+    def train(self) -> None:
+        """Entrena el IVF sobre el snapshot actual (llamar en un thread)."""
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+            n, matrix = self._n, self._matrix
+        try:
+            index = IVFIndex.train(matrix[:n])
+            with self._lock:
+                # Filas agregadas mientras se entrenaba
+                if self._n > n:
+                    index.add(np.arange(n, self._n), self._matrix[n:self._n])
+                self._index = index
+                self._trained_at = self._n
+        finally:
+            self._training = False
+
+    def search(self, query: "np.ndarray", k: int, nprobe: int = MEMORY_IVF_NPROBE) -> List[Tuple[Any, float]]:
+        """Top-k (id, score coseno) para una query normalizada de dimensión dim."""
+        with self._lock:
+            n, matrix, index = self._n, self._matrix, self._index
+        if n == 0:
+            return []
+        view = matrix[:n]
+        if index is None:
+            scores = view @ query
+            rows = _top_k(scores, k)
+            return [(self._ids[r], float(scores[r])) for r in rows]
+
+        candidates = index.candidates(query, nprobe, k)
+        candidates = candidates[candidates < n]
+        scores = view[candidates] @ query
+        best = _top_k(scores, k)
+        return [(self._ids[candidates[b]], float(scores[b])) for b in best]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "size": self._n,
+            "dim": self.dim,
+            "index": self.index_kind,
+            "nlist": len(self._index.lists) if self._index is not None else 0,
+            "bytes": self.nbytes,
+        }
@@ -0,0 +1 @@
+# Benchmarks manuales (requieren servicios reales: Ollama / Postgres)
@@ -0,0 +1,123 @@
+"""
+Micro-benchmark del scanner cognitivo (CognitiveLogger / _validate_response).
+
+Compara el loop original (re.findall / re.search por patrón, sin
+precompilar) contra COGNITIVE_SCANNER / FORBIDDEN_SCANNER sobre
+respuestas realistas de ~400 tokens, y verifica que ambos den el mismo
+resultado antes de medir.
+
+Uso (no requiere servicios):
+    python -m backend.benchmarks.cognitive_scan --runs 2000
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+
+from backend.agents.observer_agent import (
+    COGNITIVE_PATTERNS,
+    COGNITIVE_SCANNER,
+    FORBIDDEN_PATTERNS,
+    FORBIDDEN_SCANNER,
+)
+
+SENTENCES = [
+    "Se observa dolor epigástrico urente de varios días de evolución, peor en ayunas.",
+    "No se describen signos de alarma como melena, hematemesis o baja de peso.",
+    "Es posible que corresponda a gastritis o enfermedad ulcerosa péptica.",
+    "Sin embargo el examen físico es normal, pero falta la palpación abdominal profunda.",
+    "Requiere más datos sobre uso de AINEs, consumo de alcohol y tabaquismo.",
+    "Considerar solicitar hemograma, perfil hepático y test de Helicobacter pylori.",
+    "Podría ser útil registrar la relación del dolor con las comidas.",
+    "La literatura indica que el tratamiento empírico es razonable en ausencia de alarma.",
+    "No se puede descartar patología biliar sin ecografía abdominal.",
+    "El paciente refiere náuseas ocasionales sin vómitos en las últimas 48 horas.",
+    "Aunque la evolución es favorable, no obstante se sugiere control en una semana.",
+    "Documentar antecedentes familiares de cáncer gástrico.",
+]
+
+
+def make_response(rng: random.Random, target_tokens: int = 400) -> str:
+    """Respuesta del observer en el formato JSON real, ~target_tokens palabras."""
+    words = 0
+    parts = []
+    while words < target_tokens:
+        sentence = rng.choice(SENTENCES)
+        parts.append(sentence)
+        words += len(sentence.split())
+    third = len(parts) // 3
+    return json.dumps({
+        "findings": " ".join(parts[:third]),
+        "missing_data": " ".join(parts[third:2 * third]),
+        "suggested_focus": " ".join(parts[2 * third:]),
+        "confidence": "media",
+    }, ensure_ascii=False)
+
+
+def legacy_scan(text: str) -> dict:
+    text_lower = text.lower()
+    return {
+        category: [m for p in patterns for m in re.findall(p, text_lower)]
+        for category, patterns in COGNITIVE_PATTERNS.items()
+    }
+
+
+def legacy_forbidden(text: str):
+    text_lower = text.lower()
+    for pattern in FORBIDDEN_PATTERNS:
+        if re.search(pattern, text_lower):
+            return pattern
+    return None
+
+
+def scanner_scan(text: str) -> dict:
+    return COGNITIVE_SCANNER.scan(text.lower())
+
+
+def scanner_forbidden(text: str):
+    return FORBIDDEN_SCANNER.first_match(text.lower())
+
+
+def _time_us(fn, samples: list) -> dict:
+    timings = []
+    for text in samples:
+        t0 = time.perf_counter()
+        fn(text)
+        timings.append((time.perf_counter() - t0) * 1_000_000)
+    timings.sort()
+    return {
+        "p50_us": round(statistics.median(timings), 1),
+        "p95_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1),
+        "mean_us": round(statistics.mean(timings), 1),
+    }
+
+
+def main(runs: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    samples = [make_response(rng) for _ in range(runs)]
+    # Algunas respuestas con patrón prohibido al inicio
+    samples += ["Paciente con dolor abdominal. " + s for s in samples[: runs // 10]]
+
+    for text in samples:
+        assert legacy_scan(text) == scanner_scan(text), "scanner difiere del loop original"
+        assert legacy_forbidden(text) == scanner_forbidden(text), "forbidden difiere"
+
+    return {
+        "responses": len(samples),
+        "avg_tokens": round(statistics.mean(len(s.split()) for s in samples)),
+        "cognitive_before": _time_us(legacy_scan, samples),
+        "cognitive_after": _time_us(scanner_scan, samples),
+        "forbidden_before": _time_us(legacy_forbidden, samples),
+        "forbidden_after": _time_us(scanner_forbidden, samples),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(main(args.runs, args.seed), indent=2, ensure_ascii=False))
@@ -0,0 +1,104 @@
+"""
+Benchmark del recall semántico: top-k exacto vs IVF.
+
+Genera N embeddings sintéticos agrupados (mezcla de gaussianas sobre la
+esfera, como embeddings reales de un mismo usuario) y para cada modo
+registra p50 / p99 de UserVectorStore.search y el recall@k del IVF
+respecto del exacto. No usa Ollama ni la BD: mide solo el índice.
+
+Objetivo: p99 de la búsqueda que usaría el servicio (IVF sobre
+MEMORY_ANN_THRESHOLD, exacto bajo él) <= --target-ms (20 ms). Si no se
+cumple el proceso sale con código 1 (usable como gate en CI).
+No incluye el embedding de la query (Ollama), que se suma aparte.
+
+Uso:
+    python -m backend.benchmarks.memory_recall --vectors 100000 --dim 768
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from backend.app.services.vector_index import MEMORY_ANN_THRESHOLD, MEMORY_IVF_NPROBE, UserVectorStore, normalize, np
+
+
+def synthetic(n: int, centers: "np.ndarray", spread: float, rng) -> "np.ndarray":
+    dim = centers.shape[1]
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * (spread / np.sqrt(dim))
+    return normalize(centers[rng.integers(0, len(centers), n)] + noise)
+
+
+def measure(store: UserVectorStore, queries, k: int, nprobe: int):
+    latencies, results = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        results.append([node_id for node_id, _ in store.search(query, k, nprobe=nprobe)])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    ordered = sorted(latencies)
+    summary = {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+    }
+    return summary, results
+
+
+def main(
+    vectors: int, dim: int, clusters: int, spread: float, queries: int, k: int, nprobe: int, seed: int,
+    target_ms: float = 20.0,
+) -> dict:
+    if np is None:
+        raise SystemExit("numpy no instalado")
+    rng = np.random.default_rng(seed)
+    # Queries del mismo espacio temático que las memorias
+    centers = normalize(rng.standard_normal((clusters, dim)))
+    data = synthetic(vectors, centers, spread, rng)
+    probes = synthetic(queries, centers, spread, rng)
+
+    store = UserVectorStore(dim, capacity=vectors)
+    t0 = time.perf_counter()
+    store.add(list(range(vectors)), data)
+    load_s = time.perf_counter() - t0
+
+    exact, exact_ids = measure(store, probes, k, nprobe)
+
+    t0 = time.perf_counter()
+    store.train()
+    train_s = time.perf_counter() - t0
+    ivf, ivf_ids = measure(store, probes, k, nprobe)
+
+    recall = statistics.mean(len(set(a) & set(b)) / k for a, b in zip(exact_ids, ivf_ids))
+    served = ivf if vectors >= MEMORY_ANN_THRESHOLD else exact
+    return {
+        "vectors": vectors,
+        "dim": dim,
+        "store_mb": round(vectors * dim * 4 / 2**20, 1),
+        "load_s": round(load_s, 2),
+        "k": k,
+        "exact": exact,
+        "ivf": {**ivf, "nlist": store.metrics()["nlist"], "nprobe": nprobe, "train_s": round(train_s, 2)},
+        f"ivf_recall_at_{k}": round(recall, 3),
+        "target_ms": target_ms,
+        "served_index": "ivf" if served is ivf else "exact",
+        "meets_target": served["p99_ms"] <= target_ms,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=0.7, help="ruido relativo al centro del cluster")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=MEMORY_IVF_NPROBE)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--target-ms", type=float, default=20.0, help="p99 máximo aceptado")
+    args = parser.parse_args()
+    report = main(
+        args.vectors, args.dim, args.clusters, args.spread, args.queries, args.k, args.nprobe, args.seed,
+        target_ms=args.target_ms,
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    raise SystemExit(0 if report["meets_target"] else 1)
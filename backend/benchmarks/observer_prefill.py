@@ -0,0 +1,82 @@
+"""
+Benchmark antes/después del KV-cache del observer.
+
+Compara /api/generate (prompt completo por request) contra /api/chat con
+system prompt fijo + keep_alive, midiendo prompt_eval_count,
+prompt_eval_ms y response_time_ms sobre contextos distintos (sin cache
+de resultados).
+
+Uso (requiere Ollama accesible en OLLAMA_URL):
+    python -m backend.benchmarks.observer_prefill --runs 10
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+
+from backend.agents.observer_agent import ObserverAgent
+from backend.app.services.lru_cache import LRUCache
+from backend.app.services.ollama_client import close_ollama_client
+
+CONTEXTS = [
+    "Paciente indica dolor de estómago con vómitos reiterados de {n} días.",
+    "Dolor epigástrico urente de {n} días, peor en ayunas, sin melena.",
+    "Cefalea holocraneana de {n} días, sin fiebre, con fotofobia leve.",
+    "Disnea de esfuerzo progresiva de {n} semanas, edema maleolar bilateral.",
+    "Dolor torácico opresivo de {n} horas irradiado a brazo izquierdo.",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def _run_mode(use_chat: bool, runs: int) -> dict:
+    agent = ObserverAgent(use_chat=use_chat, result_cache=LRUCache(max_size=0))
+    samples = []
+    for i in range(runs):
+        ctx = {
+            "age": 45,
+            "sex": "M",
+            "medical_history": "HTA, gastritis crónica",
+            "reason_for_visit": "Control",
+            "clinical_text": CONTEXTS[i % len(CONTEXTS)].format(n=i + 2),
+        }
+        result = await agent.analyze(ctx)
+        if result.get("llm_status") == "error":
+            raise RuntimeError(result.get("llm_error"))
+        samples.append(result["metrics"])
+
+    def summary(field):
+        values = [m.get(field, 0) for m in samples]
+        return {
+            "p50": statistics.median(values),
+            "p95": _percentile(values, 0.95),
+            "mean": round(statistics.mean(values), 1),
+        }
+
+    return {
+        "api": "chat" if use_chat else "generate",
+        "runs": runs,
+        "prompt_eval_count": summary("prompt_eval_count"),
+        "prompt_eval_ms": summary("prompt_eval_ms"),
+        "response_time_ms": summary("response_time_ms"),
+    }
+
+
+async def main(runs: int) -> list:
+    try:
+        # Antes: prompt completo / Después: system fijo + keep_alive
+        # (la primera llamada chat paga el prefill; las siguientes lo reutilizan)
+        return [await _run_mode(False, runs), await _run_mode(True, runs)]
+    finally:
+        await close_ollama_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.runs)), indent=2, ensure_ascii=False))
@@ -0,0 +1,182 @@
+"""
+Benchmark antes/después del índice compuesto del timeline.
+
+Siembra N eventos (default 1M) repartidos en procedimientos en la BD de
+DATABASE_URL, y para cada fase registra:
+- EXPLAIN de la query del timeline (Postgres: EXPLAIN (ANALYZE, BUFFERS);
+  SQLite: EXPLAIN QUERY PLAN)
+- p50 / p99 de GET /procedures/{id}/timeline (primera página y página
+  siguiente vía cursor) sobre procedimientos al azar
+
+Fases:
+- before: solo el índice antiguo de una columna (procedure_id)
+- after:  índice compuesto (procedure_id, created_at, id)
+
+Uso (Postgres recomendado; en SQLite usar menos eventos):
+    DATABASE_URL=postgresql+psycopg://... python -m backend.benchmarks.timeline_indexes --events 1000000
+    python -m backend.benchmarks.timeline_indexes --events 50000 --requests 200
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select, text
+
+from backend.app.db.base import Base
+from backend.app.db.migrations import ensure_indexes
+from backend.app.db.session import engine
+from backend.app.models.voice_event import VoiceEvent, is_sqlite
+from backend.app.routes.timeline import router as timeline_router
+
+OLD_INDEX = "ix_voice_events_procedure_id"
+NEW_INDEX = "ix_voice_events_procedure_created"
+SEED_CHUNK = 10_000
+
+
+def _db_id(value: uuid.UUID):
+    return str(value) if is_sqlite else value
+
+
+def seed(events: int, procedures: int, seed_value: int) -> list:
+    """Inserta eventos con created_at creciente por procedimiento (en chunks)."""
+    rng = random.Random(seed_value)
+    procedure_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(procedures)]
+    user_id = uuid.uuid4()
+    start = datetime(2025, 1, 1)
+
+    with engine.connect() as conn:
+        existing = conn.execute(
+            select(func.count()).select_from(VoiceEvent)
+            .where(VoiceEvent.procedure_id.in_([_db_id(p) for p in procedure_ids[:10]]))
+        ).scalar()
+    if existing:
+        print(f"[SEED] Datos ya sembrados (seed={seed_value}), se reutilizan")
+        return procedure_ids
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, events, SEED_CHUNK):
+            rows = []
+            for i in range(offset, min(events, offset + SEED_CHUNK)):
+                rows.append({
+                    "id": _db_id(uuid.uuid4()),
+                    "procedure_id": _db_id(procedure_ids[i % procedures]),
+                    "user_id": _db_id(user_id),
+                    "intent": "CLINICAL_NOTE",
+                    "confidence": "LAB",
+                    "raw_text": f"Evento de benchmark {i}: paciente refiere dolor abdominal.",
+                    "feedback": {"seq": i},
+                    "source": "benchmark",
+                    "user_role": "staff",
+                    # Inserción intercalada entre procedimientos (como en producción)
+                    "created_at": start + timedelta(seconds=i),
+                })
+            conn.execute(insert(VoiceEvent), rows)
+    print(f"[SEED] {events} eventos en {time.perf_counter() - t0:.1f}s")
+    return procedure_ids
+
+
+def _timeline_sql(procedure_id: uuid.UUID, limit: int) -> str:
+    pid = str(procedure_id)
+    return (
+        "SELECT id, created_at, intent, confidence, raw_text, feedback, source, user_role "
+        f"FROM voice_events WHERE procedure_id = '{pid}' "
+        f"ORDER BY created_at, id LIMIT {limit + 1}"
+    )
+
+
+def explain(procedure_id: uuid.UUID, limit: int) -> list:
+    sql = _timeline_sql(procedure_id, limit)
+    prefix = "EXPLAIN QUERY PLAN " if is_sqlite else "EXPLAIN (ANALYZE, BUFFERS) "
+    with engine.connect() as conn:
+        rows = conn.execute(text(prefix + sql)).all()
+    # SQLite: (id, parent, notused, detail) / Postgres: una columna por línea
+    return [str(r[-1]) for r in rows]
+
+
+def set_phase(phase: str) -> None:
+    """before: solo índice de una columna / after: migración a compuesto."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if phase == "before":
+            conn.execute(text(f"DROP INDEX IF EXISTS {NEW_INDEX}"))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {OLD_INDEX} ON voice_events (procedure_id)"
+            ))
+        else:
+            conn.execute(text(f"DROP INDEX IF EXISTS {OLD_INDEX}"))
+    if phase == "after":
+        ensure_indexes(engine)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE" if is_sqlite else "ANALYZE voice_events"))
+
+
+def measure(client: TestClient, procedure_ids: list, requests: int, limit: int, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    first, following = [], []
+    for _ in range(requests):
+        pid = rng.choice(procedure_ids)
+        t0 = time.perf_counter()
+        page = client.get(f"/procedures/{pid}/timeline", params={"limit": limit}).json()
+        first.append((time.perf_counter() - t0) * 1000)
+        if page.get("next_cursor"):
+            t0 = time.perf_counter()
+            client.get(
+                f"/procedures/{pid}/timeline",
+                params={"limit": limit, "cursor": page["next_cursor"]},
+            )
+            following.append((time.perf_counter() - t0) * 1000)
+
+    def summary(values):
+        if not values:
+            return {}
+        ordered = sorted(values)
+        return {
+            "p50_ms": round(statistics.median(ordered), 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+        }
+
+    return {"first_page": summary(first), "next_page": summary(following)}
+
+
+def main(events: int, procedures: int, requests: int, limit: int, seed_value: int) -> dict:
+    Base.metadata.create_all(bind=engine)
+    procedure_ids = seed(events, procedures, seed_value)
+
+    app = FastAPI()
+    app.include_router(timeline_router)
+    client = TestClient(app)
+
+    report = {
+        "dialect": engine.dialect.name,
+        "events": events,
+        "procedures": procedures,
+        "page_size": limit,
+    }
+    for phase in ("before", "after"):
+        set_phase(phase)
+        report[phase] = {
+            "plan": explain(procedure_ids[0], limit),
+            "latency": measure(client, procedure_ids, requests, limit, seed_value),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--procedures", type=int, default=2_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=17)
+    args = parser.parse_args()
+    print(json.dumps(
+        main(args.events, args.procedures, args.requests, args.limit, args.seed),
+        indent=2, ensure_ascii=False,
+    ))
@@ -0,0 +1,46 @@
+"""
+Tests de servicios del backend (sin Ollama ni Postgres).
+
+Cada test usa su propia BD SQLite en memoria: nunca toca lab.db.
+
+Uso (desde la raíz del repo):
+    python -m pytest -q
+"""
+
+import os
+
+# Antes de importar modelos: dialecto SQLite (String(36) para UUIDs, FTS5)
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.app.db.base import Base
+from backend.app.models import memory_embedding, memory_node  # noqa: F401
+
+
+@asynccontextmanager
+async def _sqlite_sessions():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def sqlite_sessions():
+    """`async with sqlite_sessions() as session_factory:` dentro del test."""
+    return _sqlite_sessions
+
+
+@pytest.fixture
+def run():
+    """Corre una corrutina en un event loop nuevo (sin pytest-asyncio)."""
+    return asyncio.run
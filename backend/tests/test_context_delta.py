@@ -0,0 +1,46 @@
+import pytest
+
+from backend.agents.context_delta import diff_contexts
+
+
+def _ctx(clinical_text: str, **fields) -> dict:
+    return {"age": "54", "sex": "F", "clinical_text": clinical_text, **fields}
+
+
+@pytest.mark.parametrize("before, after", [
+    ("paciente con hipotensión arterial", "paciente con hipertensión arterial"),
+    ("paciente con hipertensión arterial", "paciente con hipotensión arterial"),
+    ("cuadro de hiperglucemia", "cuadro de hipoglucemia"),
+    ("cuadro de hipoglucemia", "cuadro de hiperglucemia"),
+    ("taquicardia sinusal", "bradicardia sinusal"),
+    ("hipercalemia leve", "hipocalemia leve"),
+    ("refiere disnea", "refiere apnea"),
+    ("dolor abdominal", "color abdominal"),
+    ("dolor torácico", "dolor torácico sin irradiación"),
+    ("dolor torácico de 2 horas", "dolor torácico de 3 horas"),
+    ("fiebre", "no fiebre"),
+])
+def test_clinical_changes_are_material(before, after):
+    delta = diff_contexts(_ctx(before), _ctx(after))
+    assert delta.material, delta.reasons
+
+
+@pytest.mark.parametrize("before, after", [
+    ("fibre y dolor abdominal", "fiebre y dolor abdominal"),
+    ("dolor abdomnial", "dolor abdominal"),
+    ("fiebre y tos", "Fiebre, y tos."),
+    ("dolor toracico", "dolor torácico"),
+    ("dolor torácico", "el dolor torácico"),
+])
+def test_typos_and_formatting_are_trivial(before, after):
+    delta = diff_contexts(_ctx(before), _ctx(after))
+    assert not delta.material, delta.reasons
+
+
+def test_structured_field_change_is_structural():
+    delta = diff_contexts(_ctx("dolor"), _ctx("dolor", age="55"))
+    assert delta.material and delta.structural
+
+
+def test_first_analysis_is_material():
+    assert diff_contexts(None, _ctx("dolor")).material
@@ -0,0 +1,138 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from backend.app.models.memory_node import MemoryNode
+from backend.app.services.event_writer import ACK_ENQUEUE, ACK_FLUSH, EventWriter, _PendingWrite
+
+USER_ID = "11111111-1111-1111-1111-111111111111"
+
+
+def _row(content="recuerdo", node_id=None):
+    return {"id": node_id or str(uuid.uuid4()), "user_id": USER_ID, "content": content}
+
+
+async def _count(session_factory) -> int:
+    async with session_factory() as db:
+        return (await db.execute(select(func.count()).select_from(MemoryNode))).scalar()
+
+
+class _DownSession:
+    """Sesión cuya conexión falla siempre (BD caída)."""
+
+    opened = 0
+
+    async def __aenter__(self):
+        _DownSession.opened += 1
+        raise OperationalError("connect", {}, Exception("connection refused"))
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_writes_in_one_window_share_a_flush(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            writer = EventWriter(window_ms=50, session_factory=session_factory)
+            await asyncio.gather(*[writer.write(MemoryNode, _row()) for _ in range(50)])
+            await writer.stop()
+            return writer.metrics(), await _count(session_factory)
+
+    metrics, stored = run(scenario())
+    assert stored == 50
+    assert metrics["flushes"] == 1
+    assert metrics["written"] == 50
+
+
+def test_batch_size_caps_each_flush(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            writer = EventWriter(window_ms=50, batch_size=10, session_factory=session_factory)
+            await writer.write_many(MemoryNode, [_row() for _ in range(25)])
+            await writer.stop()
+            return writer.metrics(), await _count(session_factory)
+
+    metrics, stored = run(scenario())
+    assert stored == 25
+    assert metrics["flushes"] == 3
+
+
+def test_ack_flush_returns_after_commit(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            writer = EventWriter(ack=ACK_FLUSH, window_ms=5, session_factory=session_factory)
+            await writer.write(MemoryNode, _row())
+            visible = await _count(session_factory)
+            await writer.stop()
+            return visible
+
+    assert run(scenario()) == 1
+
+
+def test_ack_enqueue_returns_before_commit(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            writer = EventWriter(ack=ACK_ENQUEUE, window_ms=50, session_factory=session_factory)
+            await writer.write(MemoryNode, _row())
+            before = (writer.metrics()["flushes"], await _count(session_factory))
+            await writer.stop()
+            return before, await _count(session_factory)
+
+    (flushes_before, stored_before), stored_after = run(scenario())
+    assert (flushes_before, stored_before) == (0, 0)
+    assert stored_after == 1
+
+
+def test_bad_row_fails_alone(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            writer = EventWriter(window_ms=50, session_factory=session_factory)
+            rows = [_row() for _ in range(8)]
+            rows[5]["content"] = None  # NOT NULL: IntegrityError solo para esta fila
+            results = await asyncio.gather(
+                *[writer.write(MemoryNode, row) for row in rows], return_exceptions=True
+            )
+            await writer.stop()
+            return results, await _count(session_factory)
+
+    results, stored = run(scenario())
+    assert isinstance(results[5], IntegrityError)
+    assert [r for i, r in enumerate(results) if i != 5] == [None] * 7
+    assert stored == 7
+
+
+def test_connection_error_fails_batch_without_bisecting(run):
+    async def scenario():
+        _DownSession.opened = 0
+        writer = EventWriter(window_ms=50, session_factory=_DownSession)
+        results = await asyncio.gather(
+            *[writer.write(MemoryNode, _row()) for _ in range(16)], return_exceptions=True
+        )
+        await writer.stop()
+        return results
+
+    results = run(scenario())
+    assert all(isinstance(r, OperationalError) for r in results)
+    assert _DownSession.opened == 1
+
+
+def test_restart_on_same_loop_keeps_pending_writes(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            writer = EventWriter(window_ms=5, session_factory=session_factory)
+            writer.start()
+            writer._task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await writer._task
+            # Fila en cola sin consumidor: start() relanza el loop sin reemplazar la cola
+            future = asyncio.get_running_loop().create_future()
+            writer._queue.put_nowait(_PendingWrite(MemoryNode, _row(), future))
+            writer.start()
+            await asyncio.wait_for(future, timeout=2)
+            await writer.stop()
+            return await _count(session_factory)
+
+    assert run(scenario()) == 1
@@ -0,0 +1,173 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from backend.app.models.memory_embedding import MemoryEmbedding  # noqa: E402
+from backend.app.models.memory_node import MemoryNode  # noqa: E402
+from backend.app.services import memory_recall  # noqa: E402
+from backend.app.services.memory_recall import MemoryRecall  # noqa: E402
+
+USER_ID = "11111111-1111-1111-1111-111111111111"
+DIM = 8
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    """Embedding determinista por texto (sin Ollama)."""
+    import numpy as np
+
+    async def embed_texts(texts, model=None):
+        return [
+            np.random.default_rng(abs(hash(text)) % 2**32).standard_normal(DIM).tolist()
+            for text in texts
+        ]
+
+    monkeypatch.setattr(memory_recall, "embed_texts", embed_texts)
+
+
+async def _add_nodes(session_factory, contents):
+    rows = [{"id": str(uuid.uuid4()), "user_id": USER_ID, "content": c} for c in contents]
+    async with session_factory() as db:
+        await db.execute(insert(MemoryNode), rows)
+        await db.commit()
+    return rows
+
+
+async def _embedding_count(session_factory) -> int:
+    async with session_factory() as db:
+        return (await db.execute(select(func.count()).select_from(MemoryEmbedding))).scalar()
+
+
+def test_duplicate_enqueue_is_coalesced(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            recall = MemoryRecall(session_factory=session_factory)
+            (row,) = await _add_nodes(session_factory, ["control de presión"])
+            recall.enqueue(row["id"], USER_ID, row["content"])
+            recall.enqueue(row["id"], USER_ID, row["content"])
+            pending = recall.metrics()["pending"]
+            await recall._embed_batch()
+            return pending, recall.metrics(), await _embedding_count(session_factory)
+
+    pending, metrics, stored = run(scenario())
+    assert pending == 1
+    assert metrics["enqueued"] == 1
+    assert stored == 1
+
+
+def test_re_enqueued_embedded_node_does_not_fail_the_batch(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            recall = MemoryRecall(session_factory=session_factory)
+            first, second = await _add_nodes(session_factory, ["cumpleaños de Ana", "turno del jueves"])
+            recall.enqueue(first["id"], USER_ID, first["content"])
+            await recall._embed_batch()
+            # Carrera backfill / insert: el mismo nodo vuelve a la cola junto a uno nuevo
+            recall.enqueue(first["id"], USER_ID, first["content"])
+            recall.enqueue(second["id"], USER_ID, second["content"])
+            await recall._embed_batch()
+            return recall.metrics(), await _embedding_count(session_factory)
+
+    metrics, stored = run(scenario())
+    assert metrics["failed_batches"] == 0
+    assert stored == 2
+
+
+def test_embeddings_written_during_load_reach_the_store(run, sqlite_sessions):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            recall = MemoryRecall(session_factory=session_factory)
+            old, new = await _add_nodes(session_factory, ["recuerdo previo", "recuerdo nuevo"])
+            recall.enqueue(old["id"], USER_ID, old["content"])
+            await recall._embed_batch()
+
+            # Sesión que se detiene tras el SELECT de la carga
+            selected, release = asyncio.Event(), asyncio.Event()
+
+            class PausedSession:
+                def __init__(self):
+                    self._db = session_factory()
+
+                async def __aenter__(self):
+                    await self._db.__aenter__()
+                    return self
+
+                async def __aexit__(self, *exc):
+                    return await self._db.__aexit__(*exc)
+
+                async def execute(self, *args, **kwargs):
+                    result = await self._db.execute(*args, **kwargs)
+                    if not selected.is_set():
+                        selected.set()
+                        await release.wait()
+                    return result
+
+            recall.session_factory = PausedSession
+            load = asyncio.ensure_future(recall._get_store(USER_ID))
+            await selected.wait()
+            recall.session_factory = session_factory
+            recall.enqueue(new["id"], USER_ID, new["content"])
+            await recall._embed_batch()
+            release.set()
+            store = await load
+            return len(store), recall._stores.get(USER_ID) is store
+
+    size, cached = run(scenario())
+    assert size == 2
+    assert cached
+
+
+def test_failed_batch_is_retried_with_backoff(run, sqlite_sessions, monkeypatch):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            recall = MemoryRecall(session_factory=session_factory, max_retries=2, retry_backoff_s=0.0)
+            (row,) = await _add_nodes(session_factory, ["alergia a penicilina"])
+            working = memory_recall.embed_texts
+
+            async def down(texts, model=None):
+                raise OSError("ollama caído")
+
+            monkeypatch.setattr(memory_recall, "embed_texts", down)
+            recall.enqueue(row["id"], USER_ID, row["content"])
+            await recall._embed_batch()
+            after_failure = recall.metrics()
+
+            monkeypatch.setattr(memory_recall, "embed_texts", working)
+            recall._requeue_ready()
+            await recall._embed_batch()
+            return after_failure, recall.metrics(), await _embedding_count(session_factory)
+
+    after_failure, metrics, stored = run(scenario())
+    assert (after_failure["failed_batches"], after_failure["retry_pending"]) == (1, 1)
+    assert metrics["retried"] == 1
+    assert metrics["retry_pending"] == 0
+    assert stored == 1
+
+
+def test_retries_are_bounded(run, sqlite_sessions, monkeypatch):
+    async def scenario():
+        async with sqlite_sessions() as session_factory:
+            recall = MemoryRecall(session_factory=session_factory, max_retries=2, retry_backoff_s=0.0)
+            (row,) = await _add_nodes(session_factory, ["control en 3 meses"])
+
+            async def down(texts, model=None):
+                raise OSError("ollama caído")
+
+            monkeypatch.setattr(memory_recall, "embed_texts", down)
+            recall.enqueue(row["id"], USER_ID, row["content"])
+            for _ in range(3):
+                await recall._embed_batch()
+                recall._requeue_ready()
+            # Descartado: un enqueue posterior (backfill) vuelve a encolarlo
+            recall.enqueue(row["id"], USER_ID, row["content"])
+            return recall.metrics()
+
+    metrics = run(scenario())
+    assert metrics["failed_batches"] == 3
+    assert metrics["dropped_failed"] == 1
+    assert metrics["pending"] == 1
@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+from backend.agents.observer_agent import (
+    COGNITIVE_PATTERNS,
+    FORBIDDEN_PATTERNS,
+    CognitiveScanner,
+    ForbiddenScanner,
+    _literal_prefix,
+)
+
+
+@pytest.mark.parametrize("pattern, prefix", [
+    ("sin embargo.*pero", "sin embargo"),
+    ("colou?r", "colo"),
+    ("dolores*", "dolore"),
+    ("ab{0,2}c", "a"),
+    ("dolor+ agudo", "dolor"),
+    ("podría|puede", ""),
+    ("(podría|puede) ser", ""),
+    ("es (posible|probable)", "es "),
+    ("literal", "literal"),
+])
+def test_literal_prefix_is_always_required(pattern, prefix):
+    assert _literal_prefix(pattern) == prefix
+
+
+@pytest.mark.parametrize("pattern, text", [
+    ("colou?r", "el color"),
+    ("dolores*", "dolore"),
+    ("ab{0,2}c", "ac"),
+    ("podría|puede", "puede ser"),
+])
+def test_prefix_gate_never_hides_a_match(pattern, text):
+    findings = CognitiveScanner({"x": [pattern]}).scan(text)
+    assert findings["x"] == re.findall(pattern, text)
+    assert findings["x"]
+
+
+def test_cognitive_scanner_matches_findall_loop():
+    text = "sin embargo podría ser viral, pero nunca se sabe; siempre y siempre"
+    expected = {
+        category: [m for pattern in patterns for m in re.findall(pattern, text)]
+        for category, patterns in COGNITIVE_PATTERNS.items()
+    }
+    assert CognitiveScanner(COGNITIVE_PATTERNS).scan(text) == expected
+
+
+@pytest.mark.parametrize("patterns", [
+    FORBIDDEN_PATTERNS,
+    [r"pero", r"sin embargo"],
+    [r"^el paciente|refiere", r"^el"],
+])
+def test_forbidden_scanner_returns_first_pattern_in_list_order(patterns):
+    scanner = ForbiddenScanner(patterns)
+    for text in ("el paciente refiere dolor", "sin embargo, pero", "presenta fiebre", "nada"):
+        expected = next((p for p in patterns if re.search(p, text)), None)
+        assert scanner.first_match(text) == expected
@@ -0,0 +1,66 @@
+from backend.app.services.task_store import InMemoryRedis, RedisTaskStore
+
+
+class _CountingRedis(InMemoryRedis):
+    """InMemoryRedis que cuenta round trips por comando."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = {}
+        self.expires_set = []
+
+    async def get(self, key):
+        self.calls["get"] = self.calls.get("get", 0) + 1
+        return await super().get(key)
+
+    async def hincrby(self, key, field, amount=1):
+        self.calls["hincrby"] = self.calls.get("hincrby", 0) + 1
+        return await super().hincrby(key, field, amount)
+
+    async def set(self, key, value, ex=None, nx=False):
+        self.expires_set.append(ex)
+        return await super().set(key, value, ex=ex, nx=nx)
+
+
+def test_get_does_one_round_trip_and_stats_are_batched(run):
+    async def scenario():
+        client = _CountingRedis()
+        store = RedisTaskStore("t", client, stats_flush_every=10)
+        await store.create("a")
+        for _ in range(6):
+            await store.get("a")
+        for _ in range(3):
+            await store.get("missing")
+        calls_before_flush = dict(client.calls)
+        return calls_before_flush, await store.metrics()
+
+    calls, metrics = run(scenario())
+    assert calls == {"get": 9}
+    assert (metrics["hits"], metrics["misses"]) == (6, 3)
+
+
+def test_stats_flush_after_threshold(run):
+    async def scenario():
+        client = _CountingRedis()
+        store = RedisTaskStore("t", client, stats_flush_every=4)
+        for _ in range(4):
+            await store.get("missing")
+        return client.calls.get("hincrby", 0), await client.hgetall("vortex:tasks:t:stats")
+
+    hincrbys, stats = run(scenario())
+    assert hincrbys == 1
+    assert stats == {"misses": "4"}
+
+
+def test_sub_second_ttl_never_sets_zero_expiry(run):
+    async def scenario():
+        client = _CountingRedis()
+        store = RedisTaskStore("t", client, ttl_s=0.3)
+        await store.create("a")
+        applied = await store.finish("a", {"status": "COMPLETED"})
+        return applied, client.expires_set, await store.get("a")
+
+    applied, expires, task = run(scenario())
+    assert applied
+    assert expires and min(expires) >= 1
+    assert task == {"status": "COMPLETED"}
@@ -0,0 +1,83 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.app.services.vector_index import IVFIndex, UserVectorStore, normalize  # noqa: E402
+
+
+def _clustered(n, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((clusters, dim)))
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * 0.1
+    return normalize(centers[rng.integers(0, clusters, n)] + noise), rng
+
+
+def _brute_force(vectors, query, k):
+    scores = vectors @ query
+    return [int(i) for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+def test_exact_search_matches_brute_force():
+    vectors, rng = _clustered(2000)
+    store = UserVectorStore(vectors.shape[1])
+    store.add(list(range(len(vectors))), vectors)
+
+    for query in normalize(rng.standard_normal((20, vectors.shape[1]))):
+        hits = store.search(query, 10)
+        assert [node_id for node_id, _ in hits] == _brute_force(vectors, query, 10)
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_ivf_probing_every_list_matches_brute_force():
+    vectors, rng = _clustered(3000)
+    store = UserVectorStore(vectors.shape[1])
+    store.add(list(range(len(vectors))), vectors)
+    store.train()
+    nlist = store.metrics()["nlist"]
+    assert store.index_kind == "ivf"
+
+    for query in normalize(rng.standard_normal((20, vectors.shape[1]))):
+        ids = [node_id for node_id, _ in store.search(query, 10, nprobe=nlist)]
+        assert ids == _brute_force(vectors, query, 10)
+
+
+def test_ivf_default_nprobe_recall_on_clustered_data():
+    vectors, rng = _clustered(5000, seed=1)
+    store = UserVectorStore(vectors.shape[1])
+    store.add(list(range(len(vectors))), vectors)
+    store.train()
+
+    queries = vectors[rng.choice(len(vectors), 50, replace=False)]
+    recall = np.mean([
+        len(set(_brute_force(vectors, q, 10)) & {i for i, _ in store.search(q, 10)}) / 10
+        for q in queries
+    ])
+    assert recall >= 0.9
+
+
+def test_vectors_added_after_training_are_searchable():
+    vectors, rng = _clustered(2000)
+    store = UserVectorStore(vectors.shape[1])
+    store.add(list(range(len(vectors))), vectors)
+    store.train()
+
+    extra = normalize(rng.standard_normal((1, vectors.shape[1])))
+    store.add(["nuevo"], extra)
+    assert store.search(extra[0], 1)[0][0] == "nuevo"
+
+
+def test_ivf_index_lists_cover_every_row_once():
+    vectors, _ = _clustered(1000)
+    index = IVFIndex.train(vectors, nlist=16)
+    rows = np.sort(np.concatenate(index.lists))
+    assert rows.tolist() == list(range(1000))
+
+
+def test_store_ignores_repeated_ids_and_grows_geometrically():
+    vectors, _ = _clustered(200)
+    store = UserVectorStore.from_matrix(list(range(100)), vectors[:100].copy())
+    assert store.nbytes == 100 * vectors.shape[1] * 4
+
+    assert store.add(list(range(50, 150)), vectors[50:150]) == 50
+    assert len(store) == 150
+    assert store.nbytes == 150 * vectors.shape[1] * 4